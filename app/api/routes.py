@@ -1,19 +1,34 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sse_starlette.sse import EventSourceResponse
 from celery.result import AsyncResult
 import json
 import uuid
 import asyncio
 import logging
+import datetime
+import re
+from typing import List, Literal, Optional
 
 from app.core.config import settings
 from app.core.celery_app import celery_app
 from app.api.schemas import (
-    ScanRequest, ScanResponse,
-    TaskStatus, ResultsResponse
+    ScanOptions, ScanRequest, ScanResponse, ValidateRequest, ValidateResponse,
+    TaskStatus, ResultsResponse, ScanSummary,
+    LinkReferrers, PageLinks, BrokenLinks
 )
 from app.services.crawler import crawl_website
-from app.utils.redis_client import get_redis_client
+from app.services.distributed import crawl_website_distributed
+from app.services.checkpoint import get_checkpoint
+from app.services.bulk_validation import parse_ndjson_urls, prepare_urls, start_validation
+from app.services.scan_coalescing import claim_scan, mark_scan_failed
+from app.services.results import ResultFilter, parse_cursor, read_results, stream_results
+from app.utils.redis_client import get_redis_client, get_async_redis_client
+from app.utils.result_store import count_records
+from app.utils.link_graph import get_referrers, get_page_links, get_broken_targets
+from app.utils.metrics import render_metrics
+from app.utils.result_stream import FINAL_STATUSES, result_stream_key
+from app.utils.scan_summary import format_summary, summary_key
 router = APIRouter()
 
 redis_client = get_redis_client()
@@ -34,13 +49,79 @@ async def health_check():
         logging.error(f"Health check failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Phase timings and queue depths of every worker, in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(redis_client), media_type="text/plain; version=0.0.4")
+
+
 @router.post("/scan", response_model=ScanResponse)
 async def start_scan(data: ScanRequest):
-    """Start a new scan task with a unique task_id."""
+    """Start a new scan task with a unique task_id.
+
+    A request for a site and options already being scanned, or scanned less
+    than `max_age` seconds ago, gets that scan's task_id with `coalesced`
+    set instead of starting another one; `max_age` 0 always starts a new scan.
+    """
     task_id = str(uuid.uuid4())
-    crawl_website.apply_async(args=[task_id, str(data.url)], task_id=task_id)
+    scan_options = ScanOptions(**data.options())
+    scan_id = claim_scan(redis_client, str(data.url), scan_options, task_id, data.max_age)
+    if scan_id != task_id:
+        logging.info(f"Scan of {data.url} coalesced with {scan_id}")
+        return {"task_id": scan_id, "coalesced": True}
+
+    task = crawl_website_distributed if data.distributed else crawl_website
+    try:
+        task.apply_async(args=[task_id, str(data.url)], kwargs={"options": data.options()}, task_id=task_id)
+    except Exception:
+        mark_scan_failed(redis_client, str(data.url), scan_options, task_id)
+        raise
     return {"task_id": task_id}
 
+@router.post("/scan/{task_id}/resume", response_model=ScanResponse)
+async def resume_scan(task_id: str):
+    """Resume an interrupted scan from its last checkpoint."""
+    checkpoint = get_checkpoint(redis_client, task_id)
+    if checkpoint is None:
+        raise HTTPException(status_code=404, detail="No checkpoint found for this task.")
+
+    # A scan that is still running refreshes its checkpoint every CHECKPOINT_INTERVAL
+    age = (datetime.datetime.utcnow() - checkpoint["updated_at"]).total_seconds()
+    if age < 2 * settings.CHECKPOINT_INTERVAL:
+        raise HTTPException(status_code=409, detail="Scan is still running.")
+
+    crawl_website.apply_async(
+        args=[task_id, checkpoint["base_url"]], kwargs={"options": checkpoint["options"]}, task_id=task_id
+    )
+    return {"task_id": task_id}
+
+@router.post("/validate", response_model=ValidateResponse)
+async def validate_urls(
+    request: Request,
+    retention: int = Query(settings.RESULT_RETENTION, ge=60, le=settings.MAX_RESULT_RETENTION),
+):
+    """Check a list of URLs without crawling, from a ValidateRequest JSON body or an NDJSON upload.
+
+    NDJSON bodies (Content-Type application/x-ndjson) hold one URL string or
+    {"url": ...} object per line and take `retention` from the query. The
+    results are read like a scan's, under the returned task_id.
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            urls = parse_ndjson_urls(body)
+        else:
+            data = ValidateRequest.model_validate_json(body)
+            urls, retention = data.urls, data.retention
+        urls = prepare_urls(urls)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not urls or len(urls) > settings.VALIDATE_MAX_URLS:
+        raise HTTPException(status_code=422, detail=f"Send between 1 and {settings.VALIDATE_MAX_URLS} URLs.")
+
+    task_id, chunks = start_validation(redis_client, urls, retention)
+    return {"task_id": task_id, "urls": len(urls), "chunks": chunks}
+
 @router.get("/status/{task_id}", response_model=TaskStatus)
 async def get_status(task_id: str):
     """Retrieve Celery task status from Redis and Celery."""
@@ -59,19 +140,113 @@ async def get_status(task_id: str):
     return {"task_id": task_id, "status": task.status}
 
 @router.get("/results/{task_id}", response_model=ResultsResponse)
-async def get_results(task_id: str):
-    """Retrieve all results stored in Redis for the given task_id."""
-    past_results = redis_client.lrange(task_id, 0, -1)
+def get_results(
+    task_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=settings.RESULTS_MAX_LIMIT),
+    status: Optional[List[str]] = Query(None, description="Status classes such as 2xx, 4xx, error or pending"),
+    link_type: Optional[Literal["internal", "external", "url"]] = Query(None, alias="type"),
+    parent: Optional[str] = None,
+    output: Literal["json", "ndjson"] = Query("json", alias="format"),
+):
+    """Retrieve the results stored for the given task_id, from `cursor` on and optionally filtered.
 
-    if not past_results:
+    Pass the returned `next_cursor` on the next poll to only get records stored
+    since. `format=ndjson` streams every matching record up to the ones stored
+    when the request arrived, with the next cursor in the X-Next-Cursor header.
+    """
+    try:
+        start = parse_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result_filter = ResultFilter(status, link_type, parent)
+
+    if output == "ndjson":
+        end = max(start, count_records(redis_client, task_id))
+        return StreamingResponse(
+            stream_results(redis_client, task_id, start, end, result_filter),
+            media_type="application/x-ndjson",
+            headers={"X-Next-Cursor": str(end)},
+        )
+
+    results, next_cursor, total = read_results(redis_client, task_id, cursor, limit, result_filter)
+    if not total:
         return {
             "task_id": task_id,
             "results": [],
+            "next_cursor": next_cursor,
+            "total": 0,
             "message": "No results found yet."
         }
 
-    results = [json.loads(r) for r in past_results]
-    return {"task_id": task_id, "results": results}
+    return {"task_id": task_id, "results": results, "next_cursor": next_cursor, "total": total}
+
+@router.get("/summary/{task_id}", response_model=ScanSummary)
+def get_summary(task_id: str):
+    """Return the scan's counters, maintained as results are stored (a single Redis read)."""
+    fields = redis_client.hgetall(summary_key(task_id))
+    if not fields:
+        raise HTTPException(status_code=404, detail="No summary found for this task.")
+    return format_summary(task_id, fields)
+
+@router.get("/graph/{task_id}/referrers", response_model=LinkReferrers)
+def graph_referrers(task_id: str, url: str, limit: Optional[int] = Query(None, ge=1, le=settings.RESULTS_MAX_LIMIT)):
+    """Return the check result of a link target and the pages linking to it."""
+    record = get_referrers(redis_client, task_id, url, limit)
+    if record is None:
+        raise HTTPException(status_code=404, detail="No page links to this URL.")
+    return {"task_id": task_id, **record}
+
+@router.get("/graph/{task_id}/links", response_model=PageLinks)
+def graph_page_links(task_id: str, page: str, broken: bool = False):
+    """Return the links found on a crawled page with their check results, only the broken ones with `broken=true`."""
+    links = get_page_links(redis_client, task_id, page, broken)
+    if links is None:
+        raise HTTPException(status_code=404, detail="Page not crawled in this scan.")
+    return {"task_id": task_id, "page": page, "links": links}
+
+@router.get("/graph/{task_id}/broken", response_model=BrokenLinks)
+def graph_broken(task_id: str):
+    """Return every broken link target of the scan, most linked first, with the number of pages linking to it."""
+    return {"task_id": task_id, "links": get_broken_targets(redis_client, task_id)}
+
+@router.get("/results/stream/{task_id}")
+async def results_stream(task_id: str, request: Request, last_event_id: Optional[str] = None):
+    """Push the scan's results and progress to the client as Server-Sent Events.
+
+    Events are "result" ({"index", "result"}), "update" (a stored result
+    changed, e.g. by the Selenium check), "progress", "reset" (rows from
+    "results" on were dropped when resuming) and "status". The stream ends
+    after a final status. Each event id is its Redis Stream entry ID, so a
+    client reconnecting with Last-Event-ID (or `last_event_id`) resumes
+    right after the last event it received.
+    """
+    last_id = request.headers.get("last-event-id") or last_event_id or "0-0"
+    if not re.fullmatch(r"\d+(-\d+)?", last_id):
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID.")
+
+    async def event_generator():
+        nonlocal last_id
+        redis = get_async_redis_client()
+        try:
+            while True:
+                entries = await redis.xread(
+                    {result_stream_key(task_id): last_id}, count=500, block=settings.RESULT_STREAM_BLOCK_MS
+                )
+                if not entries:
+                    # Nothing published for a while: stop if the scan ended without us seeing it
+                    if AsyncResult(task_id, app=celery_app).status in FINAL_STATUSES:
+                        return
+                    continue
+                for entry_id, fields in entries[0][1]:
+                    last_id = entry_id
+                    yield {"id": entry_id, "event": fields["event"], "data": fields["data"]}
+                    if fields["event"] == "status" and json.loads(fields["data"])["status"] in FINAL_STATUSES:
+                        return
+        finally:
+            await redis.aclose()
+
+    return EventSourceResponse(event_generator())
 
 @router.get("/status/stream/{task_id}")
 async def status_stream(task_id: str):
@@ -1,11 +1,49 @@
-from pydantic import BaseModel, HttpUrl
-from typing import List, Optional, Union
+from pydantic import BaseModel, HttpUrl, Field, model_validator
+from typing import Dict, List, Literal, Optional, Union
+from app.core.config import settings
 
-class ScanRequest(BaseModel):
+class ScanOptions(BaseModel):
+    concurrency: int = Field(default=settings.CRAWL_CONCURRENCY, ge=1, le=settings.MAX_CRAWL_CONCURRENCY)
+    single_fetch: bool = settings.SINGLE_FETCH
+    link_extractor: Literal["stream", "bs4"] = settings.LINK_EXTRACTOR
+    include_assets: bool = False
+    respect_robots: bool = settings.RESPECT_ROBOTS
+    use_sitemaps: bool = False
+    incremental: bool = False
+    visited_set: Literal["exact", "fingerprint", "bloom"] = settings.VISITED_SET
+    bloom_error_rate: float = Field(default=settings.BLOOM_ERROR_RATE, gt=0, lt=0.5)
+    distributed: bool = False
+    batch_size: int = Field(default=settings.DISTRIBUTED_BATCH_SIZE, ge=1, le=1000)
+    retention: int = Field(default=settings.RESULT_RETENTION, ge=60, le=settings.MAX_RESULT_RETENTION)
+
+    @model_validator(mode="after")
+    def check_incremental(self):
+        # Conditional requests and reused links only happen on the single GET of a page
+        if self.incremental and not self.single_fetch:
+            raise ValueError("incremental requires single_fetch")
+        return self
+
+class ScanRequest(ScanOptions):
     url: HttpUrl
+    # Reuse an identical scan running or completed up to this many seconds ago; 0 always starts a new one
+    max_age: int = Field(default=settings.SCAN_REUSE_WINDOW, ge=0)
+
+    def options(self) -> dict:
+        """Return the per-scan crawl options to pass to the worker."""
+        return self.model_dump(exclude={"url", "max_age"})
+
+class ValidateRequest(BaseModel):
+    urls: List[str] = Field(min_length=1, max_length=settings.VALIDATE_MAX_URLS)
+    retention: int = Field(default=settings.RESULT_RETENTION, ge=60, le=settings.MAX_RESULT_RETENTION)
+
+class ValidateResponse(BaseModel):
+    task_id: str
+    urls: int
+    chunks: int
 
 class ScanResponse(BaseModel):
     task_id: str
+    coalesced: bool = False
 
 class LinkCheckResult(BaseModel):
     url: str
@@ -13,13 +51,52 @@ class LinkCheckResult(BaseModel):
     type: str
     parent: Optional[str]
     details: str
+    cached: Optional[bool] = None
+
+class GraphLink(BaseModel):
+    url: str
+    status: Union[int, str]
+    type: Optional[str] = None
+    details: str
+    final_url: Optional[str] = None
+    referrer_count: Optional[int] = None
+
+class LinkReferrers(GraphLink):
+    task_id: str
+    referrers: List[str]
+
+class PageLinks(BaseModel):
+    task_id: str
+    page: str
+    links: List[GraphLink]
+
+class BrokenLinks(BaseModel):
+    task_id: str
+    links: List[GraphLink]
 
 class TaskStatus(BaseModel):
     task_id: str
     status: str
     result: Optional[dict] = None
 
+class ScanSummary(BaseModel):
+    task_id: str
+    pages_crawled: int
+    links_checked: int
+    internal: int
+    external: int
+    by_status: Dict[str, int]
+    broken: int
+    pending_selenium: int
+    frontier_size: Optional[int] = None
+    urls_seen: Optional[int] = None
+    pages_per_sec: Optional[float] = None
+    started_at: Optional[float] = None
+    updated_at: Optional[float] = None
+
 class ResultsResponse(BaseModel):
     task_id: str
     results: List[LinkCheckResult]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
     message: Optional[str] = None 
\ No newline at end of file
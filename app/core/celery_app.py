@@ -24,7 +24,7 @@ celery_app = Celery(
     "broken_link_checker",
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL,
-    include=["app.services.crawler"]
+    include=["app.services.crawler", "app.services.distributed", "app.services.bulk_validation"]
 )
 
 # Configure Celery
@@ -51,6 +51,9 @@ celery_app.conf.update(
     broker_ping_interval=30,
     task_routes={
         'app.services.crawler.crawl_website': {'queue': 'default'},
+        'app.services.distributed.crawl_website_distributed': {'queue': 'default'},
+        'app.services.distributed.crawl_page_batch': {'queue': 'default'},
+        'app.services.distributed.watch_distributed_crawl': {'queue': 'default'},
         'app.services.crawler.check_link_with_selenium': {'queue': 'selenium'},
     },
     task_default_queue='default',
@@ -7,6 +7,109 @@ class Settings(BaseSettings):
     USER_AGENT: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36"
     PORT: int = 10000
 
+    # Crawler
+    CRAWL_CONCURRENCY: int = 10
+    MAX_CRAWL_CONCURRENCY: int = 100
+    SINGLE_FETCH: bool = True
+    LINK_EXTRACTOR: str = "stream"
+    PARSE_EXECUTOR: str = "inline"  # inline, thread or process
+    PARSE_WORKERS: int = 2
+    HTML_MAX_BYTES: int = 5 * 1024 * 1024  # larger pages are checked but not parsed
+    VISITED_SET: str = "exact"  # exact, fingerprint or bloom
+    BLOOM_CAPACITY: int = 1_000_000
+    BLOOM_ERROR_RATE: float = 0.001
+    DISTRIBUTED_BATCH_SIZE: int = 20
+    DISTRIBUTED_STATE_TTL: int = 24 * 3600  # seconds a distributed scan's shared state outlives its last write
+    DISTRIBUTED_STALL_TIMEOUT: int = 3600  # seconds without batch activity before a distributed scan fails
+    DISTRIBUTED_WATCH_INTERVAL: int = 300  # seconds between two checks for a stalled distributed scan
+    DISTRIBUTED_HEARTBEAT_INTERVAL: int = 60  # seconds between two heartbeats of a running batch
+
+    # Sitemap seeding
+    SITEMAP_MAX_FILES: int = 100  # sitemaps fetched per scan, including nested ones
+    SITEMAP_MAX_BYTES: int = 64 * 1024 * 1024  # per sitemap, after decompression
+    SITEMAP_FRONTIER_LIMIT: int = 100_000  # queued URLs at which seeding pauses
+
+    # Incremental scans
+    SITE_STATE_TTL: int = 30 * 24 * 3600
+    INCREMENTAL_STATUS_MAX_AGE: float = 3 * 24 * 3600  # seconds a file's status is reused
+
+    # Worker HTTP connection pool, shared by the scans of a worker
+    HTTP2_ENABLED: bool = True
+    HTTP_MAX_CONNECTIONS: int = 500
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 200
+    HTTP_KEEPALIVE_EXPIRY: float = 30  # seconds an idle connection is kept open
+    HTTP_TIMEOUT: float = 10  # seconds
+    DNS_CACHE_TTL: float = 300  # seconds
+    DNS_CACHE_SIZE: int = 10_000  # hosts
+
+    # Async worker mode: every scan of a worker process on one event loop
+    ASYNC_WORKER: bool = False
+    WORKER_MAX_IN_FLIGHT: int = 500  # requests in flight across the process before new scans wait
+    WORKER_MAX_RSS: int = 1536 * 1024 * 1024  # resident bytes before new scans wait
+    ADMISSION_INTERVAL: float = 0.2  # seconds between two scans starting
+
+    # Per-host politeness
+    HOST_MAX_RATE: float = 50.0  # requests per second
+    HOST_MIN_RATE: float = 0.5
+    HOST_MAX_IN_FLIGHT: int = 10
+    HOST_THROTTLE_CACHE_SIZE: int = 10_000  # hosts whose throttle is kept once idle
+    THROTTLE_MAX_RETRIES: int = 3  # retries of a 429/503 response
+    THROTTLE_BACKOFF: float = 1.0  # seconds, doubled per retry without Retry-After
+    RETRY_AFTER_MAX: float = 60  # seconds
+    RESPECT_ROBOTS: bool = False
+    ROBOTS_CACHE_TTL: int = 24 * 3600
+
+    # External links
+    EXTERNAL_LINK_CACHE_TTL: int = 3600  # 1 hour in seconds
+    EXTERNAL_CHECK_CONCURRENCY: int = 20
+    EXTERNAL_BATCH_SIZE: int = 50
+
+    # Selenium fallback
+    SELENIUM_POOL_SIZE: int = 3  # warm drivers per worker process
+    SELENIUM_PREWARM: bool = False  # start the drivers when the worker is ready (threads pool)
+    SELENIUM_DRIVER_MAX_PAGES: int = 50
+    SELENIUM_DRIVER_MAX_AGE: float = 900  # seconds
+    SELENIUM_READY_TIMEOUT: float = 30  # seconds
+    SELENIUM_NETWORK_IDLE_MS: int = 500
+    SELENIUM_STATE_TTL: int = 24 * 3600
+
+    # Checkpoints
+    CHECKPOINT_INTERVAL: float = 60  # seconds
+    CHECKPOINT_TTL: int = 7 * 24 * 3600
+    CRAWL_TIME_BUDGET: float = 3000  # seconds per run, below task_soft_time_limit
+    MAX_CRAWL_RESUMES: int = 24
+
+    # Coalescing of identical scans
+    SCAN_REUSE_WINDOW: int = 600  # seconds a completed scan serves identical requests
+    SCAN_RUNNING_TTL: int = 24 * 3600  # longest a scan may run before identical requests stop attaching to it
+
+    # Bulk URL validation
+    VALIDATE_MAX_URLS: int = 100_000
+    VALIDATE_CHUNK_SIZE: int = 500  # URLs per chunk task
+    VALIDATE_CONCURRENCY: int = 50  # checks in flight per chunk
+
+    # Result writes
+    RESULT_BATCH_SIZE: int = 100
+    RESULT_FLUSH_INTERVAL: float = 0.5  # seconds
+    RESULT_RETENTION: int = 7 * 24 * 3600  # default per-scan retention of stored results
+    MAX_RESULT_RETENTION: int = 90 * 24 * 3600
+
+    # Live result stream
+    RESULT_STREAM_MAXLEN: int = 100_000  # events kept per scan (approximate)
+    RESULT_STREAM_TTL: int = 24 * 3600
+    RESULT_STREAM_BLOCK_MS: int = 15_000
+
+    # Summary counters
+    SUMMARY_TTL: int = 24 * 3600
+    SUMMARY_META_INTERVAL: float = 5  # seconds between summaries in the task meta
+
+    # Metrics
+    METRICS_GAUGE_TTL: float = 60  # seconds a scan's frontier size is reported after its last push
+
+    # Result reads
+    RESULTS_READ_CHUNK: int = 1000  # records decoded per read
+    RESULTS_MAX_LIMIT: int = 10_000
+
     class Config:
         env_file = ".env"
         case_sensitive = True
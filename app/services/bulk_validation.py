@@ -0,0 +1,131 @@
+"""
+Validation of a list of URLs without crawling.
+
+The list is split into chunk tasks on the default queue. Each chunk checks
+its URLs through an ExternalLinkChecker (external link cache, pooled client
+per worker, per-host politeness) and stores the results under the
+validation's task_id, so /results, /summary and the result stream work as
+for a scan. A counter of outstanding chunks detects completion: the chunk
+that brings it to zero records the result.
+"""
+import json
+import logging
+import uuid
+from urllib.parse import urldefrag
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.services.crawler import (
+    store_error, publish_status, make_result_sink, make_http_client, ExternalLinkChecker
+)
+from app.utils.metrics import start_profile, add_profile_updates, read_profile
+from app.utils.politeness import PoliteTransport
+from app.utils.redis_client import get_async_redis_client
+from app.utils.result_stream import publish_event_async
+from app.utils.worker_loop import run_async
+from app.utils.scan_summary import format_summary, summary_key
+
+VALIDATION_PREFIX = "validate:"
+
+
+def validation_key(task_id, name):
+    return f"{VALIDATION_PREFIX}{task_id}:{name}"
+
+
+def prepare_urls(urls):
+    """Return the distinct URLs of a list in order, without fragments; raise ValueError on a non-HTTP URL."""
+    prepared = {}
+    for url in urls:
+        url = urldefrag(str(url).strip())[0]
+        if not url.startswith(("http://", "https://")):
+            raise ValueError(f"Not an HTTP URL: {url}")
+        prepared[url] = None
+    return list(prepared)
+
+
+def parse_ndjson_urls(body):
+    """Return the URLs of an NDJSON upload: one JSON string or {"url": ...} object per line."""
+    urls = []
+    for number, line in enumerate(body.decode().splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            urls.append(item["url"] if isinstance(item, dict) else item)
+        except (ValueError, KeyError) as e:
+            raise ValueError(f"Invalid line {number}: {e}")
+    return urls
+
+
+def start_validation(redis, urls, retention):
+    """Split `urls` into chunk tasks and return the validation's task_id."""
+    task_id = str(uuid.uuid4())
+    chunks = [urls[i:i + settings.VALIDATE_CHUNK_SIZE] for i in range(0, len(urls), settings.VALIDATE_CHUNK_SIZE)]
+    # Register every chunk before enqueuing any, so the first to finish can't complete the validation
+    redis.set(validation_key(task_id, "pending"), len(chunks), ex=settings.SCAN_RUNNING_TTL)
+    celery_app.backend.store_result(task_id, None, "STARTED")
+    publish_status(task_id, "STARTED")
+    for chunk in chunks:
+        validate_url_chunk.apply_async(args=[task_id, chunk, retention])
+    logging.info(f"Validation {task_id} started: {len(urls)} URLs in {len(chunks)} chunks")
+    return task_id, len(chunks)
+
+
+async def finish_validation(task_id, redis):
+    """Record the validation as completed and drop its tracking keys."""
+    stats = await redis.hgetall(validation_key(task_id, "stats"))
+    result = {
+        "status": "completed",
+        "stats": {
+            **{name: int(stats.get(name, 0)) for name in ("results", "external_checked", "external_cache_hits", "throttled_responses")},
+            "profile": read_profile(stats),
+            "summary": format_summary(task_id, await redis.hgetall(summary_key(task_id))),
+        },
+    }
+    celery_app.backend.store_result(task_id, result, "SUCCESS")
+    await publish_event_async(redis, task_id, "status", {"status": "SUCCESS", "result": result})
+    await redis.delete(validation_key(task_id, "pending"), validation_key(task_id, "stats"))
+    logging.info(f"Validation {task_id} completed: {result['stats']}")
+
+
+async def async_validate_chunk(task_id, urls, retention):
+    redis = get_async_redis_client()
+    profile = start_profile()
+    try:
+        try:
+            async with make_result_sink(task_id, redis, retention=retention) as sink:
+                transport = PoliteTransport()
+                async with make_http_client(transport) as client:
+                    checker = ExternalLinkChecker(
+                        sink, redis, client, concurrency=settings.VALIDATE_CONCURRENCY, batch_size=len(urls),
+                        link_type="url"
+                    )
+                    for url in urls:
+                        checker.add(url, None)
+                    await checker.close()
+
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hincrby(validation_key(task_id, "stats"), "results", sink.written)
+                pipe.hincrby(validation_key(task_id, "stats"), "external_checked", checker.checked)
+                pipe.hincrby(validation_key(task_id, "stats"), "external_cache_hits", checker.cache_hits)
+                pipe.hincrby(validation_key(task_id, "stats"), "throttled_responses", transport.throttled_responses)
+                add_profile_updates(pipe, validation_key(task_id, "stats"), profile)
+                pipe.expire(validation_key(task_id, "stats"), settings.SCAN_RUNNING_TTL)
+                await pipe.execute()
+        finally:
+            if await redis.decr(validation_key(task_id, "pending")) == 0:
+                await finish_validation(task_id, redis)
+    finally:
+        await redis.aclose()
+
+
+@celery_app.task(name="app.services.bulk_validation.validate_url_chunk", queue="default")
+def validate_url_chunk(task_id, urls, retention=None):
+    """Check one chunk of the URLs of a validation."""
+    try:
+        run_async(async_validate_chunk(task_id, urls, retention))
+    except Exception as e:
+        error_msg = f"Error in validate_url_chunk for {task_id}: {str(e)}"
+        logging.error(error_msg)
+        store_error(task_id, urls[0], None, error_msg, link_type="url")
+        return {"status": "error", "error": str(e)}
+    return {"status": "completed", "urls": len(urls)}
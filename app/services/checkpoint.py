@@ -0,0 +1,91 @@
+import base64
+import datetime
+import json
+import logging
+import zlib
+from app.core.config import settings
+from app.utils.result_store import ResultStore
+from app.utils.result_stream import publish_event_async
+from app.utils.scan_summary import reset_summary_counts
+
+CHECKPOINT_PREFIX = "checkpoint:"
+
+
+def checkpoint_key(task_id):
+    return f"{CHECKPOINT_PREFIX}{task_id}"
+
+
+def _pack(data):
+    return base64.b64encode(zlib.compress(data)).decode()
+
+
+def _unpack(data):
+    return zlib.decompress(base64.b64decode(data))
+
+
+async def save_checkpoint(redis, task_id, base_url, scan_options, frontier, external, sink):
+    """Persist the crawl state together with the number of result records it accounts for."""
+    # Snapshot before awaiting anything so the state matches the records added so far
+    state = {
+        "base_url": base_url,
+        "options": scan_options.model_dump_json(),
+        "frontier": _pack(json.dumps(frontier.snapshot()).encode()),
+        "visited": _pack(frontier.visited.dump()),
+        "external": _pack(json.dumps(external.snapshot() if external else []).encode()),
+        "external_done": _pack(external.done.dump() if external else b""),
+        "results": sink.added,
+        "summary": json.dumps(sink.totals),
+        "updated_at": datetime.datetime.utcnow().isoformat(),
+    }
+    # Only point at records that are actually stored
+    await sink.flush()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hset(checkpoint_key(task_id), mapping=state)
+        pipe.expire(checkpoint_key(task_id), settings.CHECKPOINT_TTL)
+        await pipe.execute()
+    logging.info(f"Checkpoint saved for {task_id}: {len(frontier.visited)} URLs seen, {state['results']} results")
+
+
+async def delete_checkpoint(redis, task_id):
+    await redis.delete(checkpoint_key(task_id))
+
+
+async def restore_checkpoint(redis, task_id, frontier):
+    """Load the last checkpoint into an empty frontier and drop results written after it.
+
+    Returns the number of results kept, their summary counters, the
+    external links still to check and the dumped set of external targets
+    already stored, or None when the scan has no checkpoint.
+    """
+    checkpoint = await redis.hgetall(checkpoint_key(task_id))
+    if not checkpoint:
+        return None
+
+    frontier.visited.restore(_unpack(checkpoint["visited"]))
+    frontier.restore(json.loads(_unpack(checkpoint["frontier"])))
+    results = int(checkpoint["results"])
+    # Pages that were in flight at checkpoint time are crawled again, so their rows go
+    await ResultStore(redis, task_id).truncate(results)
+    summary = json.loads(checkpoint.get("summary", "{}"))
+    await reset_summary_counts(redis, task_id, summary)
+    # Live clients drop the rows past the checkpoint; they are stored again as the scan goes on
+    await publish_event_async(redis, task_id, "reset", {"results": results})
+    logging.info(f"Resuming {task_id} from checkpoint of {checkpoint['updated_at']}: {len(frontier)} URLs pending")
+    return {
+        "results": results,
+        "summary": summary,
+        "external": json.loads(_unpack(checkpoint["external"])),
+        "external_done": _unpack(checkpoint["external_done"]) if "external_done" in checkpoint else None,
+    }
+
+
+def get_checkpoint(redis, task_id):
+    """Return the base URL, scan options and save time of a checkpointed scan, or None."""
+    base_url, options, updated_at = redis.hmget(checkpoint_key(task_id), ["base_url", "options", "updated_at"])
+    if base_url is None:
+        return None
+    return {
+        "base_url": base_url,
+        "options": json.loads(options),
+        "updated_at": datetime.datetime.fromisoformat(updated_at),
+    }
@@ -1,59 +1,80 @@
 import time
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from app.core.celery_app import celery_app
 import httpx
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urlparse
 import json
 import asyncio
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import TimeoutException
+from celery.exceptions import MaxRetriesExceededError, Retry, SoftTimeLimitExceeded
+from celery.signals import worker_ready
 import logging
-from app.utils.redis_client import get_redis_client
+from app.utils.redis_client import get_redis_client, get_async_redis_client
+from app.utils.result_sink import ResultSink, make_error_result
+from app.utils.result_stream import publish_event, publish_event_async
+from app.utils.result_store import ResultStore, append_record, read_record, update_record
+from app.utils.link_graph import set_target, expire_graph
+from app.utils.metrics import metrics, start_profile, push_metrics_sync
+from app.utils.scan_summary import summary_key, format_summary, move_status_count, count_record, add_summary_updates
+from app.utils.visited_set import make_visited_set, ExactVisitedSet
 from app.utils.selenium_manager import SeleniumManager
-from app.utils.url_utils import normalize_url, get_headers
+from app.utils.url_utils import normalize_url, DEFAULT_HEADERS, is_leaf_url
+from app.utils.link_extractor import get_link_extractor
+from app.utils.parse_executor import get_parse_executor
+from app.utils.politeness import PoliteTransport
+from app.utils.worker_loop import run_async
+from app.utils.robots import get_robots
+from app.utils.sitemap import iter_sitemap_urls
+from app.services.frontier import Frontier
+from app.services.checkpoint import save_checkpoint, restore_checkpoint, delete_checkpoint
+from app.services.site_state import SiteState
+from app.services.scan_coalescing import mark_scan_finished, mark_scan_failed
+from app.api.schemas import ScanOptions
+from app.core.config import settings
 import datetime
+import hashlib
+from collections import Counter
+import resource
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 redis_client = get_redis_client()
 
+# Selenium results waiting to be written back to scans
+SELENIUM_STATE_PREFIX = "selenium:"
+
 # Cache for external links
 EXTERNAL_LINK_CACHE_PREFIX = "external_link_cache:"
-EXTERNAL_LINK_CACHE_TTL = 3600  # 1 hour in seconds
-
-def get_cached_external_link(url):
-    """Get cached result for an external link."""
-    cache_key = f"{EXTERNAL_LINK_CACHE_PREFIX}{url}"
-    cached_result = redis_client.get(cache_key)
-    if cached_result:
-        return json.loads(cached_result)
-    return None
+EXTERNAL_LINK_CACHE_TTL = settings.EXTERNAL_LINK_CACHE_TTL
 
-def cache_external_link(url, result):
-    """Cache result for an external link."""
-    cache_key = f"{EXTERNAL_LINK_CACHE_PREFIX}{url}"
-    redis_client.setex(cache_key, EXTERNAL_LINK_CACHE_TTL, json.dumps(result))
+def external_cache_key(url):
+    return f"{EXTERNAL_LINK_CACHE_PREFIX}{url}"
 
 def store_error(task_id, url, parent_url, error_msg, link_type="internal"):
-    """Helper function to store errors in Redis."""
-    error_data = {
-        "url": url,
-        "status": "error",
-        "type": link_type,
-        "parent": parent_url,
-        "details": error_msg
-    }
-    redis_client.rpush(task_id, json.dumps(error_data))
+    """Helper function to store errors in Redis outside of a running crawl."""
+    error_data = make_error_result(url, parent_url, error_msg, link_type)
+    counts = Counter()
+    count_record(counts, error_data)
+    index = append_record(redis_client, task_id, error_data, lambda pipe: add_summary_updates(pipe, task_id, counts))
+    publish_event(redis_client, task_id, "result", {"index": index, "result": error_data})
     logging.error(f"Error stored for {url}: {error_msg}")
 
+def publish_status(task_id, status, **data):
+    """Publish a change of the scan's task state on its result stream."""
+    try:
+        publish_event(redis_client, task_id, "status", {"status": status, **data})
+    except Exception as e:
+        logging.error(f"Failed to publish status {status} for {task_id}: {e}")
+
 @celery_app.task(name="app.services.crawler.crawl_website", queue="default", bind=True)
-def crawl_website(self, task_id, base_url):
+def crawl_website(self, task_id, base_url, options=None):
     """Crawl a website and check for broken links with parallel requests."""
+    scan_options = None
     try:
+        scan_options = ScanOptions(**(options or {}))
+
         # Initialize task status
         self.update_state(
             state='STARTED',
@@ -66,91 +87,288 @@ def crawl_website(self, task_id, base_url):
                 'date_done': None
             }
         )
+        publish_status(task_id, 'STARTED')
 
         # Verify Firefox installation before starting
         if not SeleniumManager.check_firefox_installation():
             raise RuntimeError("Firefox is not properly installed")
             
-        asyncio.run(async_crawl_website(task_id, base_url))
+        def report_summary(summary):
+            # Called from another thread, where the task's request context isn't set
+            self.update_state(
+                task_id=task_id,
+                state='STARTED',
+                meta={
+                    'task_id': task_id,
+                    'status': 'STARTED',
+                    'result': None,
+                    'summary': summary,
+                    'traceback': None,
+                    'children': [],
+                    'date_done': None
+                }
+            )
+
+        deadline = time.monotonic() + settings.CRAWL_TIME_BUDGET
+        stats = run_async(async_crawl_website(task_id, base_url, scan_options, deadline, report_summary))
         SeleniumManager.close()
 
+        if not stats["completed"]:
+            # Continue from the checkpoint in a fresh run before the task time limit hits
+            publish_status(task_id, 'RETRY')
+            raise self.retry(countdown=0, max_retries=settings.MAX_CRAWL_RESUMES)
+
         # Update task status to completed
         self.update_state(
             state='SUCCESS',
             meta={
                 'task_id': task_id,
                 'status': 'SUCCESS',
-                'result': {"status": "completed"},
+                'result': {"status": "completed", "stats": stats},
                 'traceback': None,
                 'children': [],
                 'date_done': datetime.datetime.utcnow().isoformat()
             }
         )
+        publish_status(task_id, 'SUCCESS', result={"status": "completed", "stats": stats})
+        mark_scan_finished(redis_client, base_url, scan_options, task_id)
         
-        return {"status": "completed"}
+        return {"status": "completed", "stats": stats}
+    except Retry:
+        raise
+    except SoftTimeLimitExceeded:
+        # Resume from the last periodic checkpoint
+        publish_status(task_id, 'RETRY')
+        try:
+            raise self.retry(countdown=0, max_retries=settings.MAX_CRAWL_RESUMES)
+        except MaxRetriesExceededError as e:
+            return fail_crawl(self, task_id, base_url, scan_options, e)
     except Exception as e:
-        error_msg = f"Fatal error in crawl_website task: {str(e)}"
-        logging.error(error_msg)
-        store_error(task_id, base_url, None, error_msg)
-        
-        # Update task status to failed
-        self.update_state(
-            state='FAILURE',
-            meta={
-                'task_id': task_id,
-                'status': 'FAILURE',
-                'result': None,
-                'traceback': str(e),
-                'children': [],
-                'date_done': datetime.datetime.utcnow().isoformat()
-            }
-        )
-        
-        return {"status": "error", "error": str(e)}
+        return fail_crawl(self, task_id, base_url, scan_options, e)
+
+def fail_crawl(task, task_id, base_url, scan_options, e):
+    """Record a scan as failed: error row, FAILURE state and status event, and no more coalescing onto it."""
+    error_msg = f"Fatal error in {task.name.rsplit('.', 1)[-1]} task: {str(e)}"
+    logging.error(error_msg)
+    store_error(task_id, base_url, None, error_msg)
+
+    # Update task status to failed
+    task.update_state(
+        task_id=task_id,
+        state='FAILURE',
+        meta={
+            'task_id': task_id,
+            'status': 'FAILURE',
+            'result': None,
+            'traceback': str(e),
+            'children': [],
+            'date_done': datetime.datetime.utcnow().isoformat()
+        }
+    )
+    publish_status(task_id, 'FAILURE', error=str(e))
+    if scan_options is not None:
+        mark_scan_failed(redis_client, base_url, scan_options, task_id)
+
+    return {"status": "error", "error": str(e)}
 
-async def async_crawl_website(task_id, base_url):
-    visited_urls = set()
-    to_visit = [(normalize_url(base_url), None)]
-    checked_external = set()
+async def async_crawl_website(task_id, base_url, scan_options=None, deadline=None, on_summary=None):
+    """Crawl the site and return scan statistics, including crawl-state memory.
 
+    The crawl state is checkpointed every CHECKPOINT_INTERVAL seconds and a
+    redelivered or resumed scan continues from its last checkpoint. Once
+    `deadline` (a time.monotonic() value) passes, the crawl stops, saves a
+    checkpoint and returns stats with "completed" set to False.
+
+    `on_summary`, if given, is called from a thread every
+    SUMMARY_META_INTERVAL seconds with the scan's current summary.
+
+    The stats include the time spent in each phase of this run of the scan.
+    """
+    scan_options = scan_options or ScanOptions()
+    profile = start_profile()
+    visited_urls = make_visited_set(scan_options.visited_set, settings.BLOOM_CAPACITY, scan_options.bloom_error_rate)
+    frontier = Frontier(visited_urls)
+
+    redis = get_async_redis_client()
     try:
-        async with httpx.AsyncClient(headers=get_headers(), follow_redirects=True, timeout=10) as client:
-            while to_visit:
-                batch = to_visit[:10]  # Process 10 URLs in parallel
-                to_visit = to_visit[10:]
-
-                # Run requests in parallel
-                tasks = [fetch_and_process_url(client, task_id, url, parent, visited_urls, to_visit, checked_external, base_url) 
-                        for url, parent in batch]
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # Handle any exceptions from the gathered tasks
-                for result in results:
-                    if isinstance(result, Exception):
-                        logging.error(f"Task failed with error: {str(result)}")
-    except Exception as e:
-        error_msg = f"Error in async_crawl_website: {str(e)}"
-        logging.error(error_msg)
-        store_error(task_id, base_url, None, error_msg)
-        raise
+        checkpoint = await restore_checkpoint(redis, task_id, frontier)
+        if checkpoint is None:
+            # Drop rows left by an earlier attempt that died before its first checkpoint
+            await ResultStore(redis, task_id).delete()
+            await redis.delete(summary_key(task_id))
+            frontier.put(normalize_url(base_url), None)
+
+        def gauges():
+            return {"frontier_size": len(frontier), "urls_seen": len(visited_urls)}
+
+        async with make_result_sink(
+            task_id, redis,
+            written=checkpoint["results"] if checkpoint else 0,
+            totals=checkpoint["summary"] if checkpoint else None,
+            gauges=gauges,
+            retention=scan_options.retention,
+        ) as sink:
+            external = None
 
-async def fetch_and_process_url(client, task_id, url, parent_url, visited_urls, to_visit, checked_external, base_url):
+            async def checkpoint_periodically():
+                while True:
+                    timeout = settings.CHECKPOINT_INTERVAL
+                    if deadline is not None:
+                        timeout = min(timeout, max(0, deadline - time.monotonic()))
+                    await asyncio.sleep(timeout)
+                    if deadline is not None and time.monotonic() >= deadline:
+                        logging.info(f"Time budget used for {task_id}, stopping at a checkpoint")
+                        frontier.stop()
+                        return
+                    try:
+                        await save_checkpoint(redis, task_id, base_url, scan_options, frontier, external, sink)
+                    except Exception as e:
+                        logging.error(f"Failed to save checkpoint for {task_id}: {e}")
+
+            async def report_summary_periodically():
+                while True:
+                    await asyncio.sleep(settings.SUMMARY_META_INTERVAL)
+                    try:
+                        summary = format_summary(task_id, await redis.hgetall(summary_key(task_id)))
+                        await asyncio.to_thread(on_summary, summary)
+                    except Exception as e:
+                        logging.error(f"Failed to report the summary of {task_id}: {e}")
+
+            checkpointer = asyncio.create_task(checkpoint_periodically())
+            reporter = asyncio.create_task(report_summary_periodically()) if on_summary else None
+            try:
+                transport = PoliteTransport()
+                async with make_http_client(transport) as client:
+                    robots = await load_robots(client, transport, redis, base_url)
+                    site_state = SiteState(redis, base_url) if scan_options.incremental else None
+                    external = ExternalLinkChecker(sink, redis, client, done=make_visited_set(
+                        scan_options.visited_set, settings.BLOOM_CAPACITY, scan_options.bloom_error_rate
+                    ))
+                    if checkpoint:
+                        external.restore(checkpoint["external"], checkpoint["external_done"])
+
+                    async def process(url, parent):
+                        await fetch_and_process_url(
+                            client, sink, external, url, parent, frontier, base_url, scan_options, robots, site_state
+                        )
+
+                    # Resumed scans seed again: URLs seen before the checkpoint are skipped by the visited set
+                    async def wait_for_room():
+                        while len(frontier) >= settings.SITEMAP_FRONTIER_LIMIT:
+                            await asyncio.sleep(0.1)
+
+                    feeders = []
+                    if scan_options.use_sitemaps:
+                        feeders.append(seed_from_sitemaps(client, robots, base_url, frontier, wait_for_room))
+
+                    await frontier.run(process, scan_options.concurrency, feeders)
+                    completed = not frontier.stopped
+                    if completed:
+                        await external.close()
+                    else:
+                        await save_checkpoint(redis, task_id, base_url, scan_options, frontier, external, sink)
+                        await external.cancel()
+                    if site_state:
+                        await site_state.flush()
+            except Exception as e:
+                error_msg = f"Error in async_crawl_website: {str(e)}"
+                logging.error(error_msg)
+                sink.add_error(base_url, None, error_msg)
+                raise
+            finally:
+                for task in (checkpointer, reporter):
+                    if task:
+                        task.cancel()
+                await asyncio.gather(*(task for task in (checkpointer, reporter) if task), return_exceptions=True)
+        if completed:
+            await delete_checkpoint(redis, task_id)
+            await expire_graph(redis, task_id, scan_options.retention)
+        summary = format_summary(task_id, await redis.hgetall(summary_key(task_id)))
+    finally:
+        await redis.aclose()
+
+    return {
+        "completed": completed,
+        "resumed": checkpoint is not None,
+        "urls_seen": len(visited_urls),
+        "results": sink.written,
+        "external_checked": external.checked,
+        "external_cache_hits": external.cache_hits,
+        "visited_set": scan_options.visited_set,
+        "visited_set_bytes": visited_urls.memory_bytes(),
+        "frontier_peak": frontier.peak_size,
+        "throttled_responses": transport.throttled_responses,
+        **(site_state.stats() if site_state else {}),
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "profile": profile.summary(),
+        "summary": summary,
+    }
+
+async def fetch_and_process_url(
+    client, sink, external, url, parent_url, frontier, base_url, scan_options, robots=None, site_state=None
+):
     """Fetch URL, process links, and check for broken links while logging details."""
+    with metrics.timer("process_url"):
+        await _fetch_and_process_url(
+            client, sink, external, url, parent_url, frontier, base_url, scan_options, robots, site_state
+        )
+
+async def _fetch_and_process_url(
+    client, sink, external, url, parent_url, frontier, base_url, scan_options, robots=None, site_state=None
+):
     try:
-        if url in visited_urls:
+        if robots and scan_options.respect_robots and not robots.allowed(url):
+            result_data = {
+                "url": url,
+                "status": "skipped",
+                "type": "internal",
+                "parent": parent_url,
+                "details": "Disallowed by robots.txt"
+            }
+            sink.add(result_data)
+            sink.graph.set_result(url, result_data)
             return
-        visited_urls.add(url)
 
         logging.info(f"Checking URL: {url} (Parent: {parent_url})")
 
-        status_code, final_url, details = await check_link(client, url)
+        # Internal pages are checked and downloaded with a single GET; leaf and
+        # external targets only need their status, so they stay on HEAD.
+        links = None
+        cached = False
+        is_page = urlparse(url).netloc == urlparse(base_url).netloc and not is_leaf_url(url)
+        if scan_options.single_fetch and is_page:
+            status_code, final_url, details, links, cached = await fetch_page(client, url, scan_options, site_state)
+        else:
+            # Files of an incremental scan keep their status until it expires
+            entry = site_state.fresh_status(await site_state.get(url)) if site_state and not is_page else None
+            if entry:
+                status_code, final_url, details, cached = entry["status"], entry["final_url"], "Checked in an earlier scan", True
+                site_state.reused += 1
+            else:
+                status_code, final_url, details = await check_link(client, url)
+                if site_state and not is_page and isinstance(status_code, int):
+                    await site_state.put(url, {"status": status_code, "final_url": str(final_url)})
         final_url = str(final_url)
 
         # Detect internal vs external
         netloc = urlparse(final_url).netloc
         is_external = netloc != urlparse(base_url).netloc
 
-        # Store result with parent info
+        html_error = None
+        if status_code == 200 and not is_external and not scan_options.single_fetch:
+            try:
+                start = time.perf_counter()
+                async with client.stream("GET", url) as response:
+                    metrics.observe("page_fetch", time.perf_counter() - start)
+                    if is_html(response):
+                        links = await extract_page_links(response, scan_options)
+                    else:
+                        metrics.count("non_html_skipped")
+            except Exception as e:
+                html_error = f"Error processing HTML from {url}: {str(e)}"
+
+        # Store the result and enqueue the page's links in one step, with no
+        # await in between, so a checkpoint never holds one without the other
         result_data = {
             "url": final_url,
             "status": status_code,
@@ -158,129 +376,520 @@ async def fetch_and_process_url(client, task_id, url, parent_url, visited_urls,
             "parent": parent_url,
             "details": details
         }
-        redis_client.rpush(task_id, json.dumps(result_data))
+        if cached:
+            result_data["cached"] = True
+        sink.add(result_data)
+        sink.graph.set_result(url, result_data)
+        # Only HTML pages whose links were extracted (or reused after a 304) count as crawled
+        if links is not None:
+            sink.count("pages_crawled")
         logging.info(f"Response {status_code} from {url}")
 
-        if status_code == 200 and not is_external:
-            try:
-                response = await client.get(url)
-                soup = BeautifulSoup(response.text, "html.parser")
-                for link in soup.find_all("a", href=True):
-                    try:
-                        abs_url = normalize_url(urljoin(base_url, link["href"]))
-                        if abs_url not in visited_urls:
-                            to_visit.append((abs_url, url))
-                    except Exception as e:
-                        error_msg = f"Error processing link {link.get('href', 'unknown')}: {str(e)}"
-                        store_error(task_id, link.get('href', 'unknown'), url, error_msg)
-            except Exception as e:
-                error_msg = f"Error processing HTML from {url}: {str(e)}"
-                store_error(task_id, url, parent_url, error_msg)
+        if html_error:
+            sink.add_error(url, parent_url, html_error)
+        if status_code == 200 and not is_external and links:
+            base_netloc = urlparse(base_url).netloc
+            link_urls = []
+            for link in links:
+                try:
+                    link_url = normalize_url(link)
+                    link_urls.append(link_url)
+                    if urlparse(link_url).netloc == base_netloc:
+                        frontier.put(link_url, url)
+                    else:
+                        external.add(link_url, url)
+                except Exception as e:
+                    error_msg = f"Error processing link {link}: {str(e)}"
+                    sink.add_error(link, url, error_msg)
+            sink.graph.add_links(url, link_urls)
     except Exception as e:
         error_msg = f"Error in fetch_and_process_url for {url}: {str(e)}"
-        store_error(task_id, url, parent_url, error_msg)
+        sink.add_error(url, parent_url, error_msg)
         raise
     
 @celery_app.task(name="app.services.crawler.check_link_with_selenium", queue="selenium")
-def check_link_with_selenium_task(url):
-    """Celery task to check links using Selenium."""
+def check_link_with_selenium_task(url, task_id=None, queued_at=None):
+    """Celery task to check links using Selenium, updating the scan's pending results for it.
+
+    `queued_at` is the time.time() the check was enqueued at, to measure the queueing delay.
+    """
     logging.info(f"Checking URL with Selenium: {url}")
-    
-    status_code = "error"
-    final_url = url
-    details = "Unknown error"
+    if queued_at is not None:
+        metrics.observe("selenium_wait", max(0, time.time() - queued_at))
 
+    start = time.perf_counter()
     try:
-        driver = SeleniumManager.get_instance()
-        driver.get(url)
-        try:
-            WebDriverWait(driver, 60).until(
-                lambda d: d.execute_script("return document.readyState") == "complete"
-            )
-            logging.info(f"Document readyState = complete for {url}")
-        except TimeoutException:
-            logging.warning(f"Document.readyState != complete after 60s for {url}")
+        with SeleniumManager.driver() as driver:
+            driver.get(url)
+            try:
+                ready_state = SeleniumManager.wait_until_ready(driver)
+                logging.info(f"Network idle after load for {url} (readyState = {ready_state})")
+            except TimeoutException:
+                logging.warning(f"Network not idle after {settings.SELENIUM_READY_TIMEOUT}s for {url}")
+            final_url = driver.current_url
 
-        time.sleep(3)  # Give more time for the page to load
-        
-        final_url = driver.current_url
-        status_code = 200 if driver.current_url else "error"
+        status_code = 200 if final_url else "error"
         details = "Page loaded successfully" if status_code == 200 else "Failed to load page"
-        
         logging.info(f"Selenium check completed for {url} -> {status_code}")
-        return status_code, str(final_url), details
+        result = (status_code, str(final_url), details)
 
     except Exception as e:
         error_msg = f"Selenium error for {url}: {str(e)}"
         logging.error(error_msg)
-        return "error", str(url), error_msg
+        result = ("error", str(url), error_msg)
+    metrics.observe("selenium_check", time.perf_counter() - start)
+
+    if task_id:
+        store_selenium_result(task_id, url, *result)
+    try:
+        push_metrics_sync(redis_client)
+    except Exception as e:
+        logging.error(f"Failed to push metrics: {e}")
+    return result
+
+@worker_ready.connect
+def warm_selenium_pool(**kwargs):
+    """Start the Selenium drivers before the first task; only for the threaded selenium worker."""
+    if settings.SELENIUM_PREWARM:
+        SeleniumManager.warm()
+
+def selenium_key(task_id, name):
+    return f"{SELENIUM_STATE_PREFIX}{task_id}:{name}"
+
+def update_pending_result(record, url, result):
+    """Return the stored result record updated with a Selenium result, or None if it isn't that pending check."""
+    if record is None or record["url"] != url or record["status"] != "pending":
+        return None
+    record.update(url=result["url"], status=result["status"], details=result["details"])
+    return record
+
+def store_selenium_result(task_id, url, status_code, final_url, details):
+    """Record a Selenium result for the scan and update every pending row waiting for it."""
+    result = {"url": final_url, "status": status_code, "details": f"{details} (Selenium)"}
+    rows_key = selenium_key(task_id, f"rows:{url}")
+    # Publish the result before reading the rows: rows stored later see it and update themselves
+    redis_client.hset(selenium_key(task_id, "done"), url, json.dumps(result))
+    redis_client.expire(selenium_key(task_id, "done"), settings.SELENIUM_STATE_TTL)
+    for index in redis_client.lrange(rows_key, 0, -1):
+        index = int(index)
+        updated = update_pending_result(read_record(redis_client, task_id, index), url, result)
+        if updated:
+            update_record(redis_client, task_id, index, updated, lambda pipe: (
+                move_status_count(pipe, task_id, "pending", status_code), set_target(pipe, task_id, url, updated)
+            ))
+            publish_event(redis_client, task_id, "update", {"index": index, "result": updated})
+    redis_client.delete(rows_key)
+
+async def dispatch_selenium_checks(redis, task_id, pending):
+    """Send the pending results just stored to the Selenium workers, once per URL and scan.
+
+    The row indices are recorded for the Selenium task to update; rows stored
+    after the check already finished are updated right away.
+    """
+    rows = {}
+    for index, record in pending:
+        rows.setdefault(record["url"], []).append(index)
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for url, indices in rows.items():
+            pipe.rpush(selenium_key(task_id, f"rows:{url}"), *indices)
+            pipe.expire(selenium_key(task_id, f"rows:{url}"), settings.SELENIUM_STATE_TTL)
+            pipe.sadd(selenium_key(task_id, "dispatched"), url)
+            pipe.hget(selenium_key(task_id, "done"), url)
+        pipe.expire(selenium_key(task_id, "dispatched"), settings.SELENIUM_STATE_TTL)
+        replies = await pipe.execute()
+
+    store = ResultStore(redis, task_id)
+    for i, (url, indices) in enumerate(rows.items()):
+        _, _, first_dispatch, done = replies[4 * i:4 * i + 4]
+        if done is not None:
+            result = json.loads(done)
+            for index in indices:
+                updated = update_pending_result(await store.get(index), url, result)
+                if updated:
+                    await store.update(index, updated, lambda pipe: (
+                        move_status_count(pipe, task_id, "pending", updated["status"]),
+                        set_target(pipe, task_id, url, updated),
+                    ))
+                    await publish_event_async(redis, task_id, "update", {"index": index, "result": updated})
+        elif first_dispatch:
+            check_link_with_selenium_task.apply_async(
+                args=[url], kwargs={"task_id": task_id, "queued_at": time.time()}, queue='selenium'
+            )
+            metrics.count("selenium_dispatched")
+
+def make_http_client(transport):
+    """Create the HTTP client of a crawl, sending its requests through a PoliteTransport.
+
+    The client is cheap: connections live in the worker's shared pool behind the transport.
+    """
+    return httpx.AsyncClient(
+        headers=DEFAULT_HEADERS, follow_redirects=True, timeout=settings.HTTP_TIMEOUT, transport=transport
+    )
+
+async def load_robots(client, transport, redis, base_url):
+    """Load the site's robots.txt and apply its Crawl-delay to the site's host."""
+    robots = await get_robots(client, redis, base_url)
+    if robots.crawl_delay:
+        logging.info(f"Honoring Crawl-delay of {robots.crawl_delay}s for {base_url}")
+        transport.host(urlparse(base_url).hostname).limit_rate(1 / robots.crawl_delay)
+    return robots
+
+async def seed_from_sitemaps(client, robots, base_url, frontier, after_put=None):
+    """Add the site's pages listed in its robots.txt sitemaps and /sitemap.xml to the frontier.
+
+    Pages are enqueued with their sitemap as parent while the sitemaps
+    stream in. `after_put`, if given, is awaited after each page, e.g. to
+    pause while the frontier is full. Returns the number of new URLs.
+    """
+    parsed_base = urlparse(base_url)
+    sitemap_urls = robots.sitemaps + [f"{parsed_base.scheme}://{parsed_base.netloc}/sitemap.xml"]
+    added = 0
+    try:
+        async for loc, sitemap_url in iter_sitemap_urls(client, sitemap_urls):
+            url = normalize_url(loc)
+            if urlparse(url).netloc != parsed_base.netloc:
+                continue
+            if frontier.put(url, sitemap_url):
+                added += 1
+            if after_put:
+                await after_put()
+    except Exception as e:
+        logging.error(f"Error seeding {base_url} from sitemaps: {e}")
+    logging.info(f"Seeded {added} URLs of {base_url} from sitemaps")
+    return added
+
+def make_result_sink(task_id, redis, written=0, totals=None, gauges=None, retention=None):
+    """Create the result sink of a scan; pending results are handed to the Selenium workers."""
+    async def on_pending(pending):
+        await dispatch_selenium_checks(redis, task_id, pending)
+
+    return ResultSink(
+        task_id, redis, written=written, on_pending=on_pending, totals=totals, gauges=gauges, retention=retention
+    )
 
 async def check_link(client, url):
-    """Try checking the link with HEAD, then GET, and finally Selenium if needed."""
+    """Try checking the link with HEAD, then GET, and finally Selenium if needed.
+
+    The GET fallback only reads the response headers: its body is never downloaded.
+    """
     try:
-        headers = get_headers()
-        response = await client.head(url, headers=headers, follow_redirects=True)
+        with metrics.timer("head"):
+            response = await client.head(url, follow_redirects=True)
         logging.info(f"HTTP Request: HEAD {url} -> {response.status_code}")
 
         if response.status_code not in [400, 403, 405]:
             return response.status_code, str(response.url), "Checked with HEAD"
 
         logging.warning(f"HEAD failed for {url}, falling back to GET...")
-        response = await client.get(url, headers=headers, follow_redirects=True)
+        with metrics.timer("get"):
+            async with client.stream("GET", url, follow_redirects=True) as response:
+                # Only the status is needed; leaving the block closes the body unread
+                pass
         logging.info(f"HTTP Request: GET {url} -> {response.status_code}")
 
-        if response.status_code in [400, 403, 405]:
+        if response.status_code == 403:
+            # Likely a bot challenge; the Selenium check is enqueued once the pending result is stored
             logging.warning(f"GET also failed for {url}, enqueueing Selenium check...")
-            # Enqueue Selenium check with explicit queue
-            check_link_with_selenium_task.apply_async(args=[url], queue='selenium')
             return "pending", url, "Enqueued for Selenium check"
 
         return response.status_code, str(response.url), "Checked with GET"
 
     except Exception as e:
         logging.error(f"HTTP request failed for {url}: {e}")
-        # Enqueue Selenium check with explicit queue
-        check_link_with_selenium_task.apply_async(args=[url], queue='selenium')
         return "pending", url, "Enqueued for Selenium check"
 
-async def check_external_link(task_id, url, parent_url):
-    """Check external links using all available methods with caching."""
+class PageTooLarge(Exception):
+    """An HTML page exceeds HTML_MAX_BYTES; its links are not extracted."""
+
+    def __init__(self):
+        super().__init__(f"page larger than {settings.HTML_MAX_BYTES} bytes, links not extracted")
+
+def is_html(response):
+    """Return True if a response may be an HTML page worth parsing, from its Content-Type."""
+    content_type = response.headers.get("content-type", "")
+    return not content_type or "html" in content_type
+
+def check_page_size(response):
+    """Raise PageTooLarge before reading a body whose Content-Length is over HTML_MAX_BYTES."""
+    length = response.headers.get("content-length", "")
+    if length.isdigit() and int(length) > settings.HTML_MAX_BYTES:
+        metrics.count("pages_too_large")
+        raise PageTooLarge()
+
+async def limit_page_size(chunks):
+    """Yield the chunks of a decoded body, raising PageTooLarge once they add up to more than HTML_MAX_BYTES.
+
+    Text chunks are counted in characters, close enough to bytes for a size limit.
+    """
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > settings.HTML_MAX_BYTES:
+            metrics.count("pages_too_large")
+            raise PageTooLarge()
+        yield chunk
+
+async def read_page(response):
+    """Read an HTML body, giving up with PageTooLarge past HTML_MAX_BYTES."""
+    check_page_size(response)
+    return b"".join([chunk async for chunk in limit_page_size(response.aiter_bytes())])
+
+async def extract_page_links(response, scan_options):
+    """Extract the links of an HTML response with the worker's parse executor.
+
+    Inline parsing feeds the link extractor chunk by chunk as the body arrives;
+    thread and process executors receive the raw body so the event loop keeps
+    serving other requests while the page is parsed. Either way the time spent
+    waiting for the body and parsing it are recorded as separate phases, and
+    reading stops with PageTooLarge past HTML_MAX_BYTES.
+    """
+    parse_executor = get_parse_executor()
+    page_url = str(response.url)
+    if parse_executor.streaming:
+        check_page_size(response)
+        extractor = get_link_extractor(scan_options.link_extractor, scan_options.include_assets)
+        start = time.perf_counter()
+        parsing = 0
+        async for chunk in limit_page_size(response.aiter_text()):
+            fed = time.perf_counter()
+            extractor.feed(chunk)
+            parsing += time.perf_counter() - fed
+        metrics.observe("body", time.perf_counter() - start - parsing)
+        fed = time.perf_counter()
+        links = extractor.links(page_url)
+        metrics.observe("parse", parsing + time.perf_counter() - fed)
+        return links
+
+    with metrics.timer("body"):
+        body = await read_page(response)
+    with metrics.timer("parse"):
+        return await parse_executor.extract_links(
+            body, response.encoding, page_url, scan_options.link_extractor, scan_options.include_assets
+        )
+
+async def extract_changed_page_links(response, scan_options, site_state, url, cached):
+    """Return the links of a page of an incremental scan and whether they come from the previous scan.
+
+    The body is hashed before parsing: an unchanged page reuses the links
+    extracted last time. The page's validators, hash and links are saved
+    for the next scan.
+    """
+    with metrics.timer("body"):
+        body = await read_page(response)
+    content_hash = hashlib.blake2b(body, digest_size=16).hexdigest()
+    unchanged = cached is not None and cached["hash"] == content_hash
+    if unchanged:
+        links = cached["links"]
+        site_state.unchanged += 1
+    else:
+        with metrics.timer("parse"):
+            links = await get_parse_executor().extract_links(
+                body, response.encoding, str(response.url), scan_options.link_extractor, scan_options.include_assets
+            )
+    await site_state.put(url, {
+        "etag": response.headers.get("etag"),
+        "last_modified": response.headers.get("last-modified"),
+        "hash": content_hash,
+        "links": links,
+        "final_url": str(response.url),
+        "parsed_with": parsed_with(scan_options),
+    })
+    return links, unchanged
+
+def parsed_with(scan_options):
+    """Identify the link extraction settings, so cached links are only reused with the same ones."""
+    return f"{scan_options.link_extractor}:{scan_options.include_assets}"
+
+async def fetch_page(client, url, scan_options, site_state=None):
+    """Check an internal page with a single GET, extracting its links from the same response.
+
+    Returns the status, final URL and details like check_link, plus the links
+    found on the page (None when the response is not an HTML page) and
+    whether they were reused from the previous scan. With `site_state`
+    (incremental scans) the request is conditional on the page's ETag and
+    Last-Modified, and a 304 reuses the links extracted last time.
+    """
+    headers = {}
+    cached = await site_state.get(url) if site_state else None
+    if not cached or "hash" not in cached or cached.get("parsed_with") != parsed_with(scan_options):
+        cached = None
+    elif cached["etag"] or cached["last_modified"]:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
     try:
-        # Check cache first
-        cached_result = get_cached_external_link(url)
-        if cached_result:
-            result_data = {
-                "url": cached_result["url"],
-                "status": cached_result["status"],
-                "type": "external",
-                "parent": parent_url,
-                "details": cached_result["details"],
-                "cached": True
-            }
-            redis_client.rpush(task_id, json.dumps(result_data))
-            return
+        start = time.perf_counter()
+        async with client.stream("GET", url, headers=headers, follow_redirects=True) as response:
+            # Time to the response headers; reading the body is timed with the parsing
+            metrics.observe("page_fetch", time.perf_counter() - start)
+            logging.info(f"HTTP Request: GET {url} -> {response.status_code}")
 
-        logging.info(f"Checking external URL: {url} (Parent: {parent_url})")
-        status_code, final_url, details = await check_link(httpx.AsyncClient(), url)
-        final_url = str(final_url)
+            if response.status_code == 304 and cached:
+                site_state.not_modified += 1
+                return 200, cached["final_url"], "Not modified since the last scan", cached["links"], True
 
-        # Cache the result
-        cache_external_link(url, {
-            "url": final_url,
-            "status": status_code,
-            "details": details
-        })
+            if response.status_code == 403:
+                logging.warning(f"GET failed for {url}, enqueueing Selenium check...")
+                return "pending", url, "Enqueued for Selenium check", None, False
 
-        result_data = {
-            "url": final_url,
-            "status": status_code,
-            "type": "external",
+            links = None
+            reused = False
+            details = "Checked with GET"
+            if response.status_code == 200 and is_html(response):
+                try:
+                    if site_state:
+                        links, reused = await extract_changed_page_links(response, scan_options, site_state, url, cached)
+                    else:
+                        links = await extract_page_links(response, scan_options)
+                except Exception as e:
+                    # The page itself loaded fine; only its links are unavailable
+                    logging.error(f"Error processing HTML from {url}: {e}")
+                    details = f"Checked with GET, error processing HTML: {str(e)}"
+            elif response.status_code == 200:
+                # Files are only checked: closing the stream skips their body
+                metrics.count("non_html_skipped")
+            if reused:
+                details = "Checked with GET, unchanged since the last scan"
+            return response.status_code, str(response.url), details, links, reused
+
+    except Exception as e:
+        logging.error(f"HTTP request failed for {url}: {e}")
+        return "pending", url, "Enqueued for Selenium check", None, False
+
+class ExternalLinkChecker:
+    """Check each external link of a scan once and store one result for it.
+
+    Targets are collected and deduplicated across the whole scan; the result
+    row names the first page linking to the target, and the pages linking to
+    it are found through the scan's link graph. Each batch
+    reads the cache with a single MGET, checks only the misses concurrently
+    through the scan's pooled client, and caches them with one pipeline. A
+    new batch starts as soon as the previous one is done or `batch_size`
+    targets are waiting, so checks overlap with the crawl.
+    """
+
+    def __init__(self, sink, redis, client, concurrency=None, batch_size=None, claim_key=None, link_type="external",
+                 done=None):
+        self.sink = sink
+        self.redis = redis
+        self.client = client
+        # Redis set of targets already handled by another checker of the same scan
+        self.claim_key = claim_key
+        # Type of the stored results ("url" for URLs validated outside a crawl)
+        self.link_type = link_type
+        self.batch_size = batch_size or settings.EXTERNAL_BATCH_SIZE
+        self.checked = 0
+        self.cache_hits = 0
+        self._semaphore = asyncio.Semaphore(concurrency or settings.EXTERNAL_CHECK_CONCURRENCY)
+        # Visited set of the targets already stored, of the scan's kind (exact unless given)
+        self.done = done if done is not None else ExactVisitedSet()
+        self._waiting = {}
+        self._queued = []
+        self._batches = set()
+
+    def add(self, url, parent_url):
+        """Record a link from `parent_url` to the external `url`."""
+        if url in self.done or url in self._waiting:
+            return
+        self._waiting[url] = parent_url
+        self._queued.append(url)
+        if len(self._queued) >= self.batch_size or not self._batches:
+            self._start_batch()
+
+    def _store(self, url, parent_url, result, cached):
+        record = {
+            "url": result["url"],
+            "status": result["status"],
+            "type": self.link_type,
             "parent": parent_url,
-            "details": details,
-            "cached": False
+            "details": result["details"],
+            "cached": cached
         }
-        redis_client.rpush(task_id, json.dumps(result_data))
-    except Exception as e:
-        error_msg = f"Error checking external link {url}: {str(e)}"
-        store_error(task_id, url, parent_url, error_msg, "external")
-        raise
+        self.sink.add(record)
+        self.sink.graph.set_result(url, record)
+
+    def _start_batch(self):
+        urls, self._queued = self._queued, []
+        batch = asyncio.create_task(self._check_batch(urls))
+        self._batches.add(batch)
+        batch.add_done_callback(self._batches.discard)
+
+    async def _check_one(self, url):
+        async with self._semaphore:
+            logging.info(f"Checking external URL: {url}")
+            status_code, final_url, details = await check_link(self.client, url)
+            return {"url": str(final_url), "status": status_code, "details": details}
+
+    async def _check_batch(self, urls):
+        try:
+            if self.claim_key:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for url in urls:
+                        pipe.sadd(self.claim_key, url)
+                    claimed = await pipe.execute()
+                for url, new in zip(urls, claimed):
+                    if not new:
+                        self.done.add(url)
+                        self._waiting.pop(url, None)
+                urls = [url for url, new in zip(urls, claimed) if new]
+            cached = await self.redis.mget([external_cache_key(url) for url in urls])
+            misses = [url for url, result in zip(urls, cached) if result is None]
+            for url, result in zip(urls, cached):
+                if result is not None:
+                    self.cache_hits += 1
+                    self._finish(url, json.loads(result), True)
+
+            checked = await asyncio.gather(*(self._check_one(url) for url in misses), return_exceptions=True)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for url, result in zip(misses, checked):
+                    if isinstance(result, Exception):
+                        result = make_error_result(url, None, f"Error checking external link {url}: {str(result)}")
+                    elif result["status"] != "pending":
+                        pipe.setex(external_cache_key(url), EXTERNAL_LINK_CACHE_TTL, json.dumps(result))
+                    self.checked += 1
+                    self._finish(url, result, False)
+                await pipe.execute()
+        except Exception as e:
+            for url in urls:
+                if url in self._waiting:
+                    self._finish(url, make_error_result(url, None, f"Error checking external link {url}: {str(e)}"), False)
+        finally:
+            if self._queued:
+                self._start_batch()
+
+    def _finish(self, url, result, cached):
+        self.done.add(url)
+        if url in self._waiting:
+            self._store(url, self._waiting.pop(url), result, cached)
+
+    def snapshot(self):
+        """Return the links whose target has not been checked yet, for a checkpoint; `done` is saved with dump()."""
+        return [[url, parent_url] for url, parent_url in self._waiting.items()]
+
+    def restore(self, snapshot, done=None):
+        """Restore the waiting links of snapshot() and the targets of a dumped `done` set."""
+        if done:
+            self.done.restore(done)
+        # Older checkpoints hold the stored targets as a list of URLs
+        if isinstance(snapshot, dict):
+            for url in snapshot["done"]:
+                self.done.add(url)
+            snapshot = snapshot["waiting"]
+        for url, parent_url in snapshot:
+            self.add(url, parent_url)
+
+    async def cancel(self):
+        """Abandon the checks in progress; their targets stay in snapshot() until checked."""
+        for batch in list(self._batches):
+            batch.cancel()
+        await asyncio.gather(*self._batches, return_exceptions=True)
+
+    async def close(self):
+        """Check every remaining target and store its results."""
+        if self._queued:
+            self._start_batch()
+        while self._batches:
+            await asyncio.gather(*self._batches)
@@ -0,0 +1,323 @@
+"""
+Distributed crawl of a single site across Celery workers.
+
+The frontier and the visited set live in Redis and the site is processed as
+many small page-batch tasks on the default queue. A counter of outstanding
+batch tasks detects completion: every batch registers the batches it spawns
+before releasing its own slot, so the counter only reaches zero once the
+whole site is crawled, and the task that brings it there records the result.
+
+Every write to the shared state records a heartbeat and pushes back the
+expiry of the state's keys, and running batches and sitemap seeding also
+record one every DISTRIBUTED_HEARTBEAT_INTERVAL seconds. A watchdog task
+fails the scan once no heartbeat came for DISTRIBUTED_STALL_TIMEOUT
+seconds, e.g. after a batch task was lost, and drops its state.
+"""
+from celery.exceptions import Ignore
+from app.core.celery_app import celery_app
+from app.api.schemas import ScanOptions
+from app.core.config import settings
+from app.services.crawler import (
+    fetch_and_process_url, store_error, publish_status, make_result_sink, make_http_client, load_robots, seed_from_sitemaps,
+    fail_crawl, ExternalLinkChecker, redis_client
+)
+from app.services.frontier import Frontier
+from app.services.site_state import SiteState
+from app.services.scan_coalescing import mark_scan_finished_async
+from app.utils.link_graph import expire_graph
+from app.utils.metrics import start_profile, add_profile_updates, read_profile
+from app.utils.politeness import PoliteTransport
+from app.utils.redis_client import get_async_redis_client
+from app.utils.result_stream import publish_event_async
+from app.utils.scan_summary import format_summary, summary_key
+from app.utils.url_utils import normalize_url
+from app.utils.visited_set import ExactVisitedSet, url_fingerprint
+from app.utils.worker_loop import run_async
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+
+DISTRIBUTED_PREFIX = "dcrawl:"
+# URLs buffered from the sitemaps before they are dispatched
+SEED_FLUSH_SIZE = 500
+
+
+# Keys of the shared crawl state, dropped when the scan ends
+STATE_NAMES = ("visited", "frontier", "pending", "stats", "external", "heartbeat")
+
+
+def distributed_key(task_id, name):
+    return f"{DISTRIBUTED_PREFIX}{task_id}:{name}"
+
+
+def keep_alive(pipe, task_id):
+    """Queue recording the scan's heartbeat and pushing back the expiry of its shared state."""
+    pipe.set(distributed_key(task_id, "heartbeat"), time.time())
+    for name in STATE_NAMES:
+        pipe.expire(distributed_key(task_id, name), settings.DISTRIBUTED_STATE_TTL)
+
+
+@asynccontextmanager
+async def heartbeat(redis, task_id):
+    """Keep the scan's heartbeat fresh while the block runs, however long it goes without writing."""
+    async def beat():
+        while True:
+            await asyncio.sleep(settings.DISTRIBUTED_HEARTBEAT_INTERVAL)
+            try:
+                async with redis.pipeline(transaction=False) as pipe:
+                    keep_alive(pipe, task_id)
+                    await pipe.execute()
+            except Exception as e:
+                logging.error(f"Failed to record the heartbeat of {task_id}: {e}")
+
+    beating = asyncio.create_task(beat())
+    try:
+        yield
+    finally:
+        beating.cancel()
+        await asyncio.gather(beating, return_exceptions=True)
+
+
+def stop_distributed_crawl(redis, task_id):
+    """Drop the shared state of a failed scan; batches still running then stop dispatching."""
+    with redis.pipeline(transaction=False) as pipe:
+        pipe.set(distributed_key(task_id, "failed"), 1, ex=settings.DISTRIBUTED_STATE_TTL)
+        pipe.delete(*(distributed_key(task_id, name) for name in STATE_NAMES))
+        pipe.execute()
+
+
+class RedisFrontier:
+    """Frontier shared by every batch of a scan through Redis.
+
+    Discovered URLs are buffered and enqueued once per batch: SADD on the
+    shared visited set decides which worker owns a new URL, and only those
+    are pushed to the shared queue.
+    """
+
+    def __init__(self, task_id, redis, scan_options):
+        self.task_id = task_id
+        self.redis = redis
+        self.exact = scan_options.visited_set == "exact"
+        self.visited_key = distributed_key(task_id, "visited")
+        self.queue_key = distributed_key(task_id, "frontier")
+        self._pending = {}
+
+    def put(self, url, parent_url):
+        """Buffer a discovered URL until the next flush."""
+        self._pending.setdefault(url, parent_url)
+        return True
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _member(self, url):
+        return url if self.exact else str(url_fingerprint(url))
+
+    async def flush(self):
+        """Enqueue the buffered URLs nobody has seen yet; return how many were added."""
+        if not self._pending:
+            return 0
+        pending, self._pending = list(self._pending.items()), {}
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for url, _ in pending:
+                pipe.sadd(self.visited_key, self._member(url))
+            added = await pipe.execute()
+        new_items = [json.dumps([url, parent]) for (url, parent), is_new in zip(pending, added) if is_new]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if new_items:
+                pipe.rpush(self.queue_key, *new_items)
+            keep_alive(pipe, self.task_id)
+            await pipe.execute()
+        return len(new_items)
+
+
+async def dispatch_batches(task_id, base_url, scan_options, redis):
+    """Move every queued URL into page-batch tasks; return the number of tasks sent."""
+    if await redis.exists(distributed_key(task_id, "failed")):
+        return 0
+    queue_key = distributed_key(task_id, "frontier")
+    dispatched = 0
+    while True:
+        items = await redis.lpop(queue_key, scan_options.batch_size)
+        if not items:
+            return dispatched
+        # Register the batch before sending it so the scan can't be seen as finished meanwhile
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.incr(distributed_key(task_id, "pending"))
+            keep_alive(pipe, task_id)
+            await pipe.execute()
+        crawl_page_batch.apply_async(
+            args=[task_id, base_url, scan_options.model_dump(), [json.loads(item) for item in items]]
+        )
+        dispatched += 1
+
+
+async def release_batch_slot(task_id, base_url, scan_options, redis):
+    """Release one registered batch; the last one dispatches leftover URLs or finishes the scan."""
+    # URLs left behind by a batch that failed before dispatching are picked up here
+    if await redis.decr(distributed_key(task_id, "pending")) == 0:
+        if not await dispatch_batches(task_id, base_url, scan_options, redis):
+            await finish_distributed_crawl(task_id, base_url, scan_options, redis)
+
+
+async def seed_distributed_crawl(task_id, base_url, scan_options):
+    redis = get_async_redis_client()
+    try:
+        frontier = RedisFrontier(task_id, redis, scan_options)
+        frontier.put(normalize_url(base_url), None)
+        await frontier.flush()
+        if not scan_options.use_sitemaps:
+            await dispatch_batches(task_id, base_url, scan_options, redis)
+            return
+
+        # Seeding holds a batch slot so the scan can't finish before the sitemaps are read
+        await redis.incr(distributed_key(task_id, "pending"))
+        try:
+            await dispatch_batches(task_id, base_url, scan_options, redis)
+            transport = PoliteTransport()
+            async with heartbeat(redis, task_id), make_http_client(transport) as client:
+                robots = await load_robots(client, transport, redis, base_url)
+
+                async def dispatch_seeded():
+                    if len(frontier) >= SEED_FLUSH_SIZE:
+                        await frontier.flush()
+                        await dispatch_batches(task_id, base_url, scan_options, redis)
+
+                await seed_from_sitemaps(client, robots, base_url, frontier, dispatch_seeded)
+            await frontier.flush()
+            await dispatch_batches(task_id, base_url, scan_options, redis)
+        finally:
+            await release_batch_slot(task_id, base_url, scan_options, redis)
+    finally:
+        await redis.aclose()
+
+
+async def finish_distributed_crawl(task_id, base_url, scan_options, redis):
+    """Record the scan as completed and drop its shared crawl state."""
+    stats = await redis.hgetall(distributed_key(task_id, "stats"))
+    result = {
+        "status": "completed",
+        "stats": {
+            "urls_seen": await redis.scard(distributed_key(task_id, "visited")),
+            "results": int(stats.get("results", 0)),
+            "batches": int(stats.get("batches", 0)),
+            "throttled_responses": int(stats.get("throttled_responses", 0)),
+            **{name: int(stats[name]) for name in ("pages_not_modified", "pages_unchanged", "statuses_reused") if name in stats},
+            "profile": read_profile(stats),
+            "summary": format_summary(task_id, await redis.hgetall(summary_key(task_id))),
+        },
+    }
+    await expire_graph(redis, task_id, scan_options.retention)
+    celery_app.backend.store_result(task_id, result, "SUCCESS")
+    await publish_event_async(redis, task_id, "status", {"status": "SUCCESS", "result": result})
+    await mark_scan_finished_async(redis, base_url, scan_options, task_id)
+    await redis.delete(*(distributed_key(task_id, name) for name in STATE_NAMES))
+    logging.info(f"Distributed crawl {task_id} completed: {result['stats']}")
+
+
+async def async_crawl_page_batch(task_id, base_url, scan_options, urls):
+    redis = get_async_redis_client()
+    profile = start_profile()
+    try:
+        if await redis.exists(distributed_key(task_id, "failed")):
+            logging.info(f"Skipping a batch of {task_id}: the scan failed")
+            return
+        try:
+            shared_frontier = RedisFrontier(task_id, redis, scan_options)
+            async with heartbeat(redis, task_id), make_result_sink(task_id, redis, retention=scan_options.retention) as sink:
+                transport = PoliteTransport()
+                async with make_http_client(transport) as client:
+                    robots = await load_robots(client, transport, redis, base_url)
+                    site_state = SiteState(redis, base_url) if scan_options.incremental else None
+                    # External targets are checked and stored by the first batch to claim them
+                    external = ExternalLinkChecker(sink, redis, client, claim_key=distributed_key(task_id, "external"))
+                    batch = Frontier(ExactVisitedSet())
+                    for url, parent_url in urls:
+                        batch.put(url, parent_url)
+
+                    async def process(url, parent):
+                        await fetch_and_process_url(
+                            client, sink, external, url, parent, shared_frontier, base_url, scan_options, robots, site_state
+                        )
+
+                    await batch.run(process, scan_options.concurrency)
+                    await external.close()
+                    if site_state:
+                        await site_state.flush()
+            await shared_frontier.flush()
+
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hincrby(distributed_key(task_id, "stats"), "results", sink.written)
+                pipe.hincrby(distributed_key(task_id, "stats"), "batches", 1)
+                pipe.hincrby(distributed_key(task_id, "stats"), "throttled_responses", transport.throttled_responses)
+                for name, value in (site_state.stats() if site_state else {}).items():
+                    pipe.hincrby(distributed_key(task_id, "stats"), name, value)
+                add_profile_updates(pipe, distributed_key(task_id, "stats"), profile)
+                keep_alive(pipe, task_id)
+                await pipe.execute()
+            await dispatch_batches(task_id, base_url, scan_options, redis)
+        finally:
+            await release_batch_slot(task_id, base_url, scan_options, redis)
+    finally:
+        await redis.aclose()
+
+
+@celery_app.task(name="app.services.distributed.crawl_website_distributed", queue="default", bind=True)
+def crawl_website_distributed(self, task_id, base_url, options=None):
+    """Start a distributed crawl: seed the shared frontier and hand the site over to page-batch tasks."""
+    scan_options = None
+    try:
+        scan_options = ScanOptions(**(options or {}))
+        self.update_state(
+            state='STARTED',
+            meta={
+                'task_id': task_id,
+                'status': 'STARTED',
+                'result': None,
+                'traceback': None,
+                'children': [],
+                'date_done': None
+            }
+        )
+        publish_status(task_id, 'STARTED')
+        run_async(seed_distributed_crawl(task_id, base_url, scan_options))
+        watch_distributed_crawl.apply_async(
+            args=[task_id, base_url, scan_options.model_dump()], countdown=settings.DISTRIBUTED_WATCH_INTERVAL
+        )
+    except Exception as e:
+        stop_distributed_crawl(redis_client, task_id)
+        return fail_crawl(self, task_id, base_url, scan_options, e)
+
+    # The last page-batch task records the final state
+    raise Ignore()
+
+
+@celery_app.task(name="app.services.distributed.crawl_page_batch", queue="default")
+def crawl_page_batch(task_id, base_url, options, urls):
+    """Crawl one batch of pages of a distributed scan and dispatch the URLs it discovers."""
+    scan_options = ScanOptions(**options)
+    try:
+        run_async(async_crawl_page_batch(task_id, base_url, scan_options, urls))
+    except Exception as e:
+        error_msg = f"Error in crawl_page_batch for {task_id}: {str(e)}"
+        logging.error(error_msg)
+        store_error(task_id, base_url, None, error_msg)
+
+
+@celery_app.task(name="app.services.distributed.watch_distributed_crawl", queue="default", bind=True)
+def watch_distributed_crawl(self, task_id, base_url, options):
+    """Fail a distributed scan whose batches stopped making progress, or check it again later."""
+    heartbeat = redis_client.get(distributed_key(task_id, "heartbeat"))
+    if heartbeat is None:
+        # The scan completed or failed and its state was dropped
+        return
+    idle = time.time() - float(heartbeat)
+    if idle < settings.DISTRIBUTED_STALL_TIMEOUT:
+        watch_distributed_crawl.apply_async(args=[task_id, base_url, options], countdown=settings.DISTRIBUTED_WATCH_INTERVAL)
+        return
+    pending = redis_client.get(distributed_key(task_id, "pending"))
+    stop_distributed_crawl(redis_client, task_id)
+    error = RuntimeError(f"Distributed crawl stalled: no heartbeat for {int(idle)}s with {pending} batches outstanding")
+    return fail_crawl(self, task_id, base_url, ScanOptions(**options), error)
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+
+
+class _UrlQueue(asyncio.Queue):
+    def snapshot(self):
+        return list(self._queue)
+
+
+class Frontier:
+    """Queue of URLs waiting to be crawled, drained by a pool of long-lived workers.
+
+    URLs are deduplicated against the visited set when they are enqueued, so
+    each URL is queued at most once no matter how many pages link to it.
+    """
+
+    def __init__(self, visited):
+        self.visited = visited
+        self.peak_size = 0
+        self._queue = _UrlQueue()
+        self._in_flight = set()
+        self._stopped = asyncio.Event()
+
+    def put(self, url, parent_url):
+        """Schedule a URL for crawling; return False if it was already seen."""
+        if not self.visited.add(url):
+            return False
+        self._queue.put_nowait((url, parent_url))
+        self.peak_size = max(self.peak_size, self._queue.qsize())
+        return True
+
+    def restore(self, items):
+        """Re-queue URLs from a snapshot; they are already in the restored visited set."""
+        for url, parent_url in items:
+            self._queue.put_nowait((url, parent_url))
+
+    def snapshot(self):
+        """Return every URL not fully processed yet, including those being crawled right now."""
+        return list(self._in_flight) + self._queue.snapshot()
+
+    def stop(self):
+        """Make run() return early, leaving unfinished URLs in the frontier."""
+        self._stopped.set()
+
+    @property
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    async def run(self, handler, concurrency, feeders=()):
+        """Run `concurrency` workers calling `handler(url, parent_url)` until the frontier is drained or stopped.
+
+        Each worker pulls the next URL as soon as it is free, so a slow page only
+        occupies its own slot instead of stalling a whole batch. `feeders` are
+        coroutines adding URLs alongside the workers; the frontier only counts
+        as drained once they are done.
+        """
+        async def worker():
+            while True:
+                item = await self._queue.get()
+                self._in_flight.add(item)
+                try:
+                    await handler(*item)
+                except Exception as e:
+                    logging.error(f"Task failed with error: {str(e)}")
+                # A worker cancelled by stop() leaves its URL in flight for the snapshot
+                self._in_flight.discard(item)
+                self._queue.task_done()
+
+        async def drain():
+            await asyncio.gather(*feeders)
+            await self._queue.join()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        drained = asyncio.create_task(drain())
+        stopped = asyncio.create_task(self._stopped.wait())
+        try:
+            await asyncio.wait({drained, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in workers + [drained, stopped]:
+                task.cancel()
+            await asyncio.gather(*workers, drained, stopped, return_exceptions=True)
@@ -0,0 +1,60 @@
+import json
+from app.utils.result_store import count_records, iter_records
+from app.utils.scan_summary import status_class
+
+
+class ResultFilter:
+    """Server-side filter of scan results by status class, link type and parent page."""
+
+    def __init__(self, statuses=None, link_type=None, parent=None):
+        self.statuses = {s.strip().lower() for value in statuses or [] for s in value.split(",") if s.strip()}
+        self.link_type = link_type
+        self.parent = parent
+
+    def __bool__(self):
+        return bool(self.statuses or self.link_type or self.parent)
+
+    def match(self, record):
+        if self.statuses and status_class(record["status"]) not in self.statuses:
+            return False
+        if self.link_type and record["type"] != self.link_type:
+            return False
+        if self.parent and record["parent"] != self.parent:
+            return False
+        return True
+
+
+def parse_cursor(cursor):
+    """Return the list index a cursor points at; None starts from the beginning, an invalid cursor raises ValueError."""
+    try:
+        return max(0, int(cursor)) if cursor else 0
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def read_results(redis, task_id, cursor=None, limit=None, result_filter=None):
+    """Return up to `limit` matching results from `cursor` on, the cursor to continue from and the record count.
+
+    The next cursor points right after the last record examined, so polling with
+    it only returns records stored since.
+    """
+    start = parse_cursor(cursor)
+    end = count_records(redis, task_id)
+    results = []
+    next_index = start
+    for index, record in iter_records(redis, task_id, start, end):
+        next_index = index + 1
+        if result_filter and not result_filter.match(record):
+            continue
+        results.append(record)
+        if limit and len(results) >= limit:
+            break
+    return results, str(next_index), end
+
+
+def stream_results(redis, task_id, start, end, result_filter=None):
+    """Yield matching records start..end-1 as NDJSON lines."""
+    for _, record in iter_records(redis, task_id, start, end):
+        if result_filter and not result_filter.match(record):
+            continue
+        yield json.dumps(record) + "\n"
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import time
+from redis.exceptions import WatchError
+from app.core.config import settings
+from app.utils.url_utils import normalize_url
+
+SCAN_COALESCE_PREFIX = "scan_of:"
+
+# Options that change how fast a scan runs, not what it finds
+SPEED_OPTIONS = {"concurrency", "batch_size", "distributed"}
+
+
+def coalesce_key(base_url, scan_options):
+    """Return the key shared by every scan of the same site with the same options."""
+    options = scan_options.model_dump(exclude=SPEED_OPTIONS)
+    digest = hashlib.sha1(json.dumps([normalize_url(base_url), options], sort_keys=True).encode()).hexdigest()
+    return f"{SCAN_COALESCE_PREFIX}{digest}"
+
+
+def claim_scan(redis, base_url, scan_options, task_id, max_age):
+    """Return the scan serving a request: a running identical scan, one completed less than `max_age`
+    seconds ago, or else `task_id`, registered as running and to be enqueued by the caller.
+
+    A `max_age` of 0 always registers `task_id`, even while an identical scan runs.
+    """
+    key = coalesce_key(base_url, scan_options)
+    with redis.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                pipe.watch(key)
+                entry = pipe.get(key)
+                if entry and max_age > 0:
+                    entry = json.loads(entry)
+                    if entry["status"] == "running" or time.time() - entry["finished_at"] <= max_age:
+                        return entry["task_id"]
+                pipe.multi()
+                pipe.set(key, json.dumps({"task_id": task_id, "status": "running"}), ex=settings.SCAN_RUNNING_TTL)
+                pipe.execute()
+                return task_id
+            except WatchError:
+                continue
+
+
+def _finished_entry(task_id):
+    return json.dumps({"task_id": task_id, "status": "done", "finished_at": time.time()})
+
+
+def mark_scan_finished(redis, base_url, scan_options, task_id):
+    """Make a completed scan the one reused by identical requests while its results are kept."""
+    redis.set(coalesce_key(base_url, scan_options), _finished_entry(task_id), ex=scan_options.retention)
+
+
+async def mark_scan_finished_async(redis, base_url, scan_options, task_id):
+    await redis.set(coalesce_key(base_url, scan_options), _finished_entry(task_id), ex=scan_options.retention)
+
+
+def mark_scan_failed(redis, base_url, scan_options, task_id):
+    """Stop pointing identical requests at a failed scan, unless a newer scan took its place."""
+    key = coalesce_key(base_url, scan_options)
+    with redis.pipeline(transaction=True) as pipe:
+        try:
+            pipe.watch(key)
+            entry = pipe.get(key)
+            if entry and json.loads(entry)["task_id"] == task_id:
+                pipe.multi()
+                pipe.delete(key)
+                pipe.execute()
+        except WatchError:
+            # The entry changed, so it is no longer this scan's
+            pass
@@ -0,0 +1,66 @@
+import json
+import time
+from urllib.parse import urlparse
+from app.core.config import settings
+
+SITE_STATE_PREFIX = "site_state:"
+
+
+def site_state_key(base_url):
+    return f"{SITE_STATE_PREFIX}{urlparse(base_url).netloc}"
+
+
+class SiteState:
+    """What the previous scans of a site learned about each of its URLs, kept in one Redis hash per site.
+
+    Pages keep their ETag, Last-Modified, content hash and outlinks so a
+    re-scan can send conditional requests and skip parsing unchanged pages;
+    files keep their status so it is reused until INCREMENTAL_STATUS_MAX_AGE.
+    Updates are buffered and written in pipelined batches.
+    """
+
+    def __init__(self, redis, base_url, batch_size=None):
+        self.redis = redis
+        self.key = site_state_key(base_url)
+        self.batch_size = batch_size or settings.RESULT_BATCH_SIZE
+        self.not_modified = 0
+        self.unchanged = 0
+        self.reused = 0
+        self._buffer = {}
+
+    def stats(self):
+        return {
+            "pages_not_modified": self.not_modified,
+            "pages_unchanged": self.unchanged,
+            "statuses_reused": self.reused,
+        }
+
+    async def get(self, url):
+        entry = await self.redis.hget(self.key, url)
+        return json.loads(entry) if entry else None
+
+    def fresh_status(self, entry):
+        """Return a stored file status still young enough to be reused, or None."""
+        if not entry or "status" not in entry or "hash" in entry:
+            return None
+        # Broken links are always checked again
+        if not isinstance(entry["status"], int) or entry["status"] >= 400:
+            return None
+        if time.time() - entry["checked_at"] > settings.INCREMENTAL_STATUS_MAX_AGE:
+            return None
+        return entry
+
+    async def put(self, url, entry):
+        entry["checked_at"] = time.time()
+        self._buffer[url] = json.dumps(entry)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        entries, self._buffer = self._buffer, {}
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hset(self.key, mapping=entries)
+            pipe.expire(self.key, settings.SITE_STATE_TTL)
+            await pipe.execute()
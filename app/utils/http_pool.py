@@ -0,0 +1,224 @@
+"""
+HTTP connection pool shared by the scans of a worker.
+
+Every scan wraps the same pooled transport in its own PoliteTransport and
+client, so successive scans and the many hosts of external links reuse
+open connections (HTTP/2 where the server offers it, idle connections kept
+for HTTP_KEEPALIVE_EXPIRY seconds) and DNS lookups (cached for
+DNS_CACHE_TTL seconds) instead of paying for them again.
+
+Connections belong to the event loop they were opened on, so there is one
+pool per loop; tasks run on their thread's persistent loop (see
+worker_loop.run_async) to share it.
+"""
+import asyncio
+import ipaddress
+import socket
+import time
+import urllib.request
+import weakref
+from contextlib import contextmanager
+import httpcore
+import httpx
+from app.core.config import settings
+from app.utils.metrics import metrics
+
+_pools = weakref.WeakKeyDictionary()
+
+
+def is_ip_address(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+class DNSCache:
+    """Addresses of the hosts looked up recently, kept for `ttl` seconds and at most `max_size` hosts.
+
+    Concurrent lookups of the same host share one getaddrinfo call; failed
+    lookups are not cached.
+    """
+
+    def __init__(self, ttl=None, max_size=None):
+        self.ttl = settings.DNS_CACHE_TTL if ttl is None else ttl
+        self.max_size = max_size or settings.DNS_CACHE_SIZE
+        self._entries = {}
+        self._lookups = {}
+
+    async def resolve(self, host, port):
+        """Return the addresses of a host, in the resolver's order of preference."""
+        key = (host, port)
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            metrics.count("dns_cache_hits")
+            return entry[1]
+        lookup = self._lookups.get(key)
+        if lookup is None:
+            lookup = self._lookups[key] = asyncio.ensure_future(self._lookup(host, port))
+            lookup.add_done_callback(lambda done: (self._lookups.pop(key, None), done.cancelled() or done.exception()))
+        # One caller giving up must not cancel the lookup the others wait for
+        return await asyncio.shield(lookup)
+
+    async def _lookup(self, host, port):
+        metrics.count("dns_lookups")
+        with metrics.timer("dns"):
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self._entries.pop((host, port), None)
+        while len(self._entries) >= self.max_size:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[(host, port)] = (time.monotonic() + self.ttl, addresses)
+        return addresses
+
+    def forget(self, host, port):
+        self._entries.pop((host, port), None)
+
+
+class CachingNetworkBackend(httpcore.AsyncNetworkBackend):
+    """Network backend resolving host names through a DNSCache, then trying each address in turn.
+
+    TLS still verifies and sends SNI for the host name, which httpcore
+    passes separately when it starts TLS on the connection.
+    """
+
+    def __init__(self, dns_cache, backend=None):
+        self.dns_cache = dns_cache
+        self._backend = backend or httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        if is_ip_address(host):
+            addresses = [host]
+        else:
+            try:
+                addresses = await asyncio.wait_for(self.dns_cache.resolve(host, port), timeout)
+            except asyncio.TimeoutError:
+                raise httpcore.ConnectTimeout(f"Timed out resolving {host}")
+            except OSError as e:
+                raise httpcore.ConnectError(f"Failed to resolve {host}: {e}") from e
+
+        error = None
+        for address in addresses:
+            try:
+                with metrics.timer("connect"):
+                    return await self._backend.connect_tcp(
+                        address, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                    )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        # The host may have moved: look it up again next time
+        self.dns_cache.forget(host, port)
+        raise error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+@contextmanager
+def httpx_exceptions():
+    """Raise the httpx exception of the same name in place of an httpcore one, as httpx's own transport does."""
+    try:
+        yield
+    except Exception as e:
+        for cls in type(e).__mro__:
+            mapped = getattr(httpx, cls.__name__, None) if cls.__module__.startswith("httpcore") else None
+            if mapped is not None:
+                raise mapped(str(e)) from e
+        raise
+
+
+class _PooledStream(httpx.AsyncByteStream):
+    def __init__(self, stream):
+        self._stream = stream
+
+    async def __aiter__(self):
+        with httpx_exceptions():
+            async for chunk in self._stream:
+                yield chunk
+
+    async def aclose(self):
+        await self._stream.aclose()
+
+
+class PooledTransport(httpx.AsyncBaseTransport):
+    """httpx transport over a connection pool sized by the HTTP_* settings that resolves hosts through a DNSCache.
+
+    httpx has no option for the network backend, so the transport drives
+    httpcore pools itself. A client given a transport ignores the proxy
+    environment, so this one honors it instead: with `trust_env`, requests
+    go through the proxy HTTP_PROXY, HTTPS_PROXY or ALL_PROXY sets for their
+    scheme, except to the hosts of NO_PROXY, each proxy with its own pool.
+    """
+
+    def __init__(self, dns_cache=None, http2=None, trust_env=True):
+        self.http2 = settings.HTTP2_ENABLED if http2 is None else http2
+        self.dns_cache = dns_cache or DNSCache()
+        self._pool = self._make_pool()
+        self._proxies = urllib.request.getproxies() if trust_env else {}
+        self._proxy_pools = {}
+
+    def _make_pool(self, proxy=None):
+        if proxy is not None:
+            proxy = httpx.Proxy(proxy if "://" in proxy else f"http://{proxy}")
+            proxy = httpcore.Proxy(
+                url=httpcore.URL(
+                    scheme=proxy.url.raw_scheme, host=proxy.url.raw_host, port=proxy.url.port, target=proxy.url.raw_path
+                ),
+                auth=proxy.raw_auth,
+                headers=proxy.headers.raw,
+                ssl_context=proxy.ssl_context,
+            )
+        return httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            proxy=proxy,
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            http1=True,
+            http2=self.http2,
+            network_backend=CachingNetworkBackend(self.dns_cache),
+        )
+
+    def _pool_for(self, url):
+        proxy = self._proxies.get(url.scheme) or self._proxies.get("all")
+        if not proxy or urllib.request.proxy_bypass(url.host):
+            return self._pool
+        if proxy not in self._proxy_pools:
+            self._proxy_pools[proxy] = self._make_pool(proxy)
+        return self._proxy_pools[proxy]
+
+    async def handle_async_request(self, request):
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme, host=request.url.raw_host, port=request.url.port, target=request.url.raw_path
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with httpx_exceptions():
+            response = await self._pool_for(request.url).handle_async_request(core_request)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_PooledStream(response.stream),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        for pool in (self._pool, *self._proxy_pools.values()):
+            await pool.aclose()
+
+
+def get_http_pool():
+    """Return the shared transport of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = PooledTransport()
+    return pool
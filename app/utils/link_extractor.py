@@ -0,0 +1,117 @@
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+from bs4 import BeautifulSoup
+
+# Tag -> attributes holding a link, always extracted
+PAGE_LINK_ATTRS = {
+    "a": ("href",),
+    "area": ("href",),
+}
+
+# Tag -> attributes holding a sub-resource, extracted with include_assets
+ASSET_LINK_ATTRS = {
+    "link": ("href",),
+    "img": ("src", "srcset"),
+    "script": ("src",),
+    "source": ("src", "srcset"),
+}
+
+CRAWLABLE_SCHEMES = {"http", "https"}
+
+
+def parse_srcset(value):
+    """Return the URLs listed in a srcset attribute."""
+    urls = []
+    for candidate in value.split(","):
+        parts = candidate.strip().split()
+        if parts:
+            urls.append(parts[0])
+    return urls
+
+
+def resolve_links(raw_links, page_url, base_href=None):
+    """Resolve raw attribute values against the page URL and <base href>, dropping non-HTTP links."""
+    base_url = urljoin(page_url, base_href) if base_href else page_url
+    links = []
+    for raw in raw_links:
+        raw = raw.strip()
+        if not raw or raw.startswith("#"):
+            continue
+        abs_url = urljoin(base_url, raw)
+        if urlparse(abs_url).scheme in CRAWLABLE_SCHEMES:
+            links.append(abs_url)
+    return links
+
+
+class StreamingLinkExtractor(HTMLParser):
+    """Collect link attributes from HTML fed in chunks as it arrives, without building a DOM."""
+
+    def __init__(self, include_assets=False):
+        super().__init__(convert_charrefs=True)
+        self.tags = dict(PAGE_LINK_ATTRS, **ASSET_LINK_ATTRS) if include_assets else PAGE_LINK_ATTRS
+        self.base_href = None
+        self.raw_links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "base":
+            if self.base_href is None:
+                self.base_href = dict(attrs).get("href")
+            return
+
+        link_attrs = self.tags.get(tag)
+        if not link_attrs:
+            return
+        for name, value in attrs:
+            if value is None or name not in link_attrs:
+                continue
+            if name == "srcset":
+                self.raw_links.extend(parse_srcset(value))
+            else:
+                self.raw_links.append(value)
+
+    def links(self, page_url):
+        """Finish parsing and return the absolute links found on the page."""
+        self.close()
+        return resolve_links(self.raw_links, page_url, self.base_href)
+
+
+class SoupLinkExtractor:
+    """Collect links by building a full BeautifulSoup tree once the whole page is received."""
+
+    def __init__(self, include_assets=False):
+        self.tags = dict(PAGE_LINK_ATTRS, **ASSET_LINK_ATTRS) if include_assets else PAGE_LINK_ATTRS
+        self.chunks = []
+
+    def feed(self, data):
+        self.chunks.append(data)
+
+    def links(self, page_url):
+        """Parse the buffered page and return the absolute links found on it."""
+        soup = BeautifulSoup("".join(self.chunks), "html.parser")
+        base = soup.find("base", href=True)
+        raw_links = []
+        for tag in soup.find_all(list(self.tags)):
+            for name in self.tags[tag.name]:
+                value = tag.get(name)
+                if value is None:
+                    continue
+                if name == "srcset":
+                    raw_links.extend(parse_srcset(value))
+                else:
+                    raw_links.append(value)
+        return resolve_links(raw_links, page_url, base["href"] if base else None)
+
+
+LINK_EXTRACTORS = {
+    "stream": StreamingLinkExtractor,
+    "bs4": SoupLinkExtractor,
+}
+
+
+def get_link_extractor(engine="stream", include_assets=False):
+    """Return a new link extractor for one page; feed it text chunks, then call links(page_url)."""
+    try:
+        extractor_class = LINK_EXTRACTORS[engine]
+    except KeyError:
+        raise ValueError(f"Unknown link extractor: {engine}")
+    return extractor_class(include_assets=include_assets)
@@ -0,0 +1,201 @@
+import json
+import logging
+from app.core.config import settings
+from app.utils.metrics import metrics
+from app.utils.scan_summary import BROKEN_CLASSES, status_class
+from app.utils.url_utils import normalize_url
+from app.utils.visited_set import url_fingerprint
+
+LINK_GRAPH_PREFIX = "graph:"
+# Node ids are fixed-width hex fingerprints, so adjacency strings are split without separators
+NODE_ID_SIZE = 16
+
+
+def graph_key(task_id, name):
+    return f"{LINK_GRAPH_PREFIX}{task_id}:{name}"
+
+
+def node_id(url):
+    return format(url_fingerprint(url), f"0{NODE_ID_SIZE}x")
+
+
+def split_ids(packed):
+    """Return the distinct node ids of an adjacency string, in the order they were added."""
+    ids = (packed[i:i + NODE_ID_SIZE] for i in range(0, len(packed or ""), NODE_ID_SIZE))
+    return list(dict.fromkeys(ids))
+
+
+def is_broken(status):
+    return status_class(status) in BROKEN_CLASSES
+
+
+def set_target(pipe, task_id, url, record):
+    """Queue storing the check result of a link target, from its result record."""
+    target = node_id(url)
+    pipe.hset(graph_key(task_id, "targets"), target, json.dumps(
+        [record["status"], record["type"], record["details"], record["url"]], separators=(",", ":")
+    ))
+    if is_broken(record["status"]):
+        pipe.sadd(graph_key(task_id, "broken"), target)
+    else:
+        pipe.srem(graph_key(task_id, "broken"), target)
+
+
+class LinkGraph:
+    """Link graph of a scan: each target's check result once, plus adjacency between pages and targets.
+
+    URLs are interned as 64-bit fingerprints in hex. Every target keeps its
+    result in one hash field, every page the packed ids of its links
+    (out:{id}) and every target the packed ids of the pages linking to it
+    (in:{id}, appended), so "pages linking to X" and "broken links on page Y"
+    are single-key lookups. Updates are buffered and written with each flush
+    of the scan's ResultSink; writing the same page or target again is
+    harmless, so resumed scans need no cleanup. While the scan runs keys get
+    a TTL longer than any scan when created, and expire_graph sets them all
+    to expire together, the scan's retention after it ends.
+    """
+
+    def __init__(self, redis, task_id, retention=None):
+        self.redis = redis
+        self.task_id = task_id
+        self.retention = retention or settings.RESULT_RETENTION
+        # TTL of the keys while the scan runs: longer than any scan, so none expires before expire_graph
+        self.running_ttl = self.retention + settings.SCAN_RUNNING_TTL
+        self._links = {}
+        self._targets = {}
+
+    def add_links(self, page_url, urls):
+        """Record the links found on a page."""
+        self._links[page_url] = list(dict.fromkeys(urls))
+
+    def set_result(self, url, record):
+        """Record the check result of a target; `url` is the URL as linked, before redirects."""
+        self._targets[url] = record
+
+    async def flush(self):
+        if not self._links and not self._targets:
+            return
+        links, self._links = self._links, {}
+        targets, self._targets = self._targets, {}
+        nodes = {}
+        # Pipeline position of each APPEND, to tell the keys it created
+        appends = []
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for page_url, urls in links.items():
+                    page = node_id(page_url)
+                    nodes[page] = page_url
+                    ids = [node_id(url) for url in urls]
+                    nodes.update(zip(ids, urls))
+                    pipe.set(graph_key(self.task_id, f"out:{page}"), "".join(ids), ex=self.running_ttl)
+                    for target in ids:
+                        appends.append((len(pipe), graph_key(self.task_id, f"in:{target}")))
+                        pipe.append(graph_key(self.task_id, f"in:{target}"), page)
+                for url, record in targets.items():
+                    nodes[node_id(url)] = url
+                    set_target(pipe, self.task_id, url, record)
+                if nodes:
+                    pipe.hset(graph_key(self.task_id, "nodes"), mapping=nodes)
+                for name in ("nodes", "targets", "broken"):
+                    pipe.expire(graph_key(self.task_id, name), self.running_ttl)
+                with metrics.timer("graph_write"):
+                    replies = await pipe.execute()
+        except BaseException:
+            # Keep the updates for the next flush attempt; newer ones win
+            self._links = {**links, **self._links}
+            self._targets = {**targets, **self._targets}
+            raise
+
+        # Only the in:{id} keys this flush created need a TTL; the others got theirs when created
+        created = [key for index, key in appends if replies[index] == NODE_ID_SIZE]
+        if created:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key in created:
+                        pipe.expire(key, self.running_ttl)
+                    await pipe.execute()
+            except Exception as e:
+                # expire_graph still sets them at scan end
+                logging.error(f"Failed to set the TTL of {len(created)} graph keys of {self.task_id}: {e}")
+
+
+async def expire_graph(redis, task_id, retention, batch_size=1000):
+    """Expire every key of a scan's graph `retention` seconds from now, once the scan ended.
+
+    Until then keys keep the provisional TTL they got when created, the
+    retention plus SCAN_RUNNING_TTL, which outlasts the scan.
+    """
+    names = ["nodes", "targets", "broken"]
+    cursor = 0
+    while True:
+        cursor, ids = await redis.hscan(graph_key(task_id, "nodes"), cursor, count=batch_size)
+        async with redis.pipeline(transaction=False) as pipe:
+            for name in names:
+                pipe.expire(graph_key(task_id, name), retention)
+            for node in ids:
+                pipe.expire(graph_key(task_id, f"out:{node}"), retention)
+                pipe.expire(graph_key(task_id, f"in:{node}"), retention)
+            await pipe.execute()
+        names = []
+        if not cursor:
+            break
+
+
+def _target_records(redis, task_id, ids):
+    if not ids:
+        return []
+    urls = redis.hmget(graph_key(task_id, "nodes"), ids)
+    targets = redis.hmget(graph_key(task_id, "targets"), ids)
+    records = []
+    for target, url, packed in zip(ids, urls, targets):
+        status, link_type, details, final_url = json.loads(packed) if packed else ("unchecked", None, "", url)
+        records.append({
+            "id": target, "url": url, "status": status, "type": link_type, "details": details, "final_url": final_url,
+        })
+    return records
+
+
+def get_referrers(redis, task_id, url, limit=None):
+    """Return the check result of a target and the pages linking to it, or None if no page links to it.
+
+    `url` is normalized like the links the crawler records.
+    """
+    url = normalize_url(url)
+    target = node_id(url)
+    referrers = split_ids(redis.get(graph_key(task_id, f"in:{target}")))
+    if not referrers:
+        return None
+    record = _target_records(redis, task_id, [target])[0]
+    record.pop("id")
+    record["url"] = record["url"] or url
+    record["referrer_count"] = len(referrers)
+    record["referrers"] = redis.hmget(graph_key(task_id, "nodes"), referrers[:limit] if limit else referrers)
+    return record
+
+
+def get_page_links(redis, task_id, page_url, broken_only=False):
+    """Return the links found on a page with their check results, or None if the page wasn't crawled.
+
+    `page_url` is normalized like the pages the crawler records.
+    """
+    packed = redis.get(graph_key(task_id, f"out:{node_id(normalize_url(page_url))}"))
+    if packed is None:
+        return None
+    records = _target_records(redis, task_id, split_ids(packed))
+    for record in records:
+        record.pop("id")
+    if broken_only:
+        records = [record for record in records if is_broken(record["status"])]
+    return records
+
+
+def get_broken_targets(redis, task_id):
+    """Return every broken target of the scan with the number of pages linking to it."""
+    records = _target_records(redis, task_id, sorted(redis.smembers(graph_key(task_id, "broken"))))
+    with redis.pipeline(transaction=False) as pipe:
+        for record in records:
+            pipe.get(graph_key(task_id, f"in:{record.pop('id')}"))
+        referrers = pipe.execute()
+    for record, packed in zip(records, referrers):
+        record["referrer_count"] = len(split_ids(packed))
+    return sorted(records, key=lambda record: -record["referrer_count"])
@@ -0,0 +1,257 @@
+"""
+Hot-path timings and queue depths of the workers, exposed by /metrics.
+
+Each process records the duration of the crawl phases (network requests,
+body download, parsing, Redis writes, Selenium) in histograms kept in
+memory, and adds what it recorded since its last push to shared Redis
+hashes with HINCRBY, so every worker's numbers add up in one place.
+Running scans report their frontier size with each push; the depths of
+the Celery queues are read from the broker when /metrics is scraped.
+
+Phases timed while a ScanProfile is active (see start_profile) are also
+added to that scan's profile, stored with its stats.
+"""
+import contextvars
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from app.core.config import settings
+
+METRICS_PREFIX = "metrics:"
+
+# Upper bounds of the phase histogram buckets, in seconds
+PHASE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Celery queues whose depth is reported
+QUEUES = ("default", "selenium")
+
+_profile = contextvars.ContextVar("scan_profile", default=None)
+
+
+def metrics_key(name):
+    return f"{METRICS_PREFIX}{name}"
+
+
+def bucket_index(seconds):
+    """Return the index of the histogram bucket of a duration; len(PHASE_BUCKETS) is +Inf."""
+    for i, bound in enumerate(PHASE_BUCKETS):
+        if seconds <= bound:
+            return i
+    return len(PHASE_BUCKETS)
+
+
+class ScanProfile:
+    """Count and total time of each phase of one scan (or one batch of it)."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.seconds = Counter()
+
+    def observe(self, phase, seconds):
+        self.counts[phase] += 1
+        self.seconds[phase] += seconds
+
+    def summary(self):
+        return format_profile(self.counts, self.seconds)
+
+
+def format_profile(counts, seconds):
+    """Return the profile stored with a scan's stats: count, total and mean time of each phase."""
+    return {
+        phase: {
+            "count": int(count),
+            "total_seconds": round(seconds[phase], 3),
+            "mean_ms": round(1000 * seconds[phase] / count, 2),
+        }
+        for phase, count in sorted(counts.items()) if count
+    }
+
+
+def start_profile():
+    """Profile the phases timed from here on in the current task and the tasks it creates."""
+    profile = ScanProfile()
+    _profile.set(profile)
+    return profile
+
+
+def add_profile_updates(pipe, key, profile):
+    """Queue adding a profile to the one accumulated in a stats hash by the batches of a scan."""
+    for phase, count in profile.counts.items():
+        pipe.hincrby(key, f"profile:{phase}:count", count)
+        pipe.hincrbyfloat(key, f"profile:{phase}:seconds", profile.seconds[phase])
+
+
+def read_profile(fields):
+    """Return the profile accumulated in a stats hash by add_profile_updates."""
+    counts = Counter()
+    seconds = Counter()
+    for name, value in fields.items():
+        if name.startswith("profile:"):
+            _, phase, kind = name.split(":")
+            if kind == "count":
+                counts[phase] = int(value)
+            else:
+                seconds[phase] = float(value)
+    return format_profile(counts, seconds)
+
+
+class Metrics:
+    """Phase histograms and counters recorded by this process since its last push."""
+
+    def __init__(self):
+        # The Selenium worker records from several threads
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._sums = Counter()
+        self._counters = Counter()
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            buckets = self._buckets.setdefault(phase, Counter())
+            buckets[bucket_index(seconds)] += 1
+            self._sums[phase] += seconds
+        profile = _profile.get()
+        if profile is not None:
+            profile.observe(phase, seconds)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    @contextmanager
+    def timer(self, phase):
+        """Time the enclosed block as `phase`, also when it raises; awaits inside it count."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    def take(self):
+        """Return and reset what was recorded since the last call."""
+        with self._lock:
+            taken = self._buckets, self._sums, self._counters
+            self._buckets, self._sums, self._counters = {}, Counter(), Counter()
+        return taken
+
+    def restore(self, taken):
+        """Add back what take() returned, after a failed push."""
+        buckets, sums, counters = taken
+        with self._lock:
+            for phase, counts in buckets.items():
+                self._buckets.setdefault(phase, Counter()).update(counts)
+            self._sums.update(sums)
+            self._counters.update(counters)
+
+
+metrics = Metrics()
+
+
+def add_metrics_updates(pipe, taken, task_id=None, frontier_size=None):
+    """Queue adding recorded metrics to the shared hashes, and the frontier size of a running scan."""
+    buckets, sums, counters = taken
+    for phase, counts in buckets.items():
+        key = metrics_key(f"phase:{phase}")
+        for index, count in counts.items():
+            pipe.hincrby(key, str(index), count)
+        pipe.hincrby(key, "count", sum(counts.values()))
+        pipe.hincrbyfloat(key, "sum", sums[phase])
+        pipe.sadd(metrics_key("phases"), phase)
+    for name, value in counters.items():
+        pipe.hincrby(metrics_key("counters"), name, value)
+    if task_id is not None and frontier_size is not None:
+        pipe.hset(metrics_key("frontier"), task_id, json.dumps([frontier_size, time.time()]))
+
+
+async def push_metrics(redis, task_id=None, frontier_size=None):
+    """Add this process's metrics since the last push to Redis (asyncio client)."""
+    taken = metrics.take()
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            add_metrics_updates(pipe, taken, task_id, frontier_size)
+            if len(pipe):
+                await pipe.execute()
+    except BaseException:
+        metrics.restore(taken)
+        raise
+
+
+def push_metrics_sync(redis):
+    """Add this process's metrics since the last push to Redis (sync client)."""
+    taken = metrics.take()
+    try:
+        with redis.pipeline(transaction=False) as pipe:
+            add_metrics_updates(pipe, taken)
+            if len(pipe):
+                pipe.execute()
+    except BaseException:
+        metrics.restore(taken)
+        raise
+
+
+async def clear_frontier_gauge(redis, task_id):
+    """Stop reporting the frontier of a scan that stopped running."""
+    await redis.hdel(metrics_key("frontier"), task_id)
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics(redis):
+    """Return the aggregated metrics of every worker in the Prometheus text exposition format."""
+    phases = sorted(redis.smembers(metrics_key("phases")))
+    with redis.pipeline(transaction=False) as pipe:
+        for phase in phases:
+            pipe.hgetall(metrics_key(f"phase:{phase}"))
+        pipe.hgetall(metrics_key("counters"))
+        pipe.hgetall(metrics_key("frontier"))
+        for queue in QUEUES:
+            pipe.llen(queue)
+        replies = pipe.execute()
+    histograms = replies[:len(phases)]
+    counters, frontier = replies[len(phases)], replies[len(phases) + 1]
+    depths = replies[len(phases) + 2:]
+
+    lines = [
+        "# HELP linkcheck_phase_seconds Time spent in each phase of the crawl workers.",
+        "# TYPE linkcheck_phase_seconds histogram",
+    ]
+    for phase, fields in zip(phases, histograms):
+        cumulative = 0
+        for i, bound in enumerate(PHASE_BUCKETS):
+            cumulative += int(fields.get(str(i), 0))
+            lines.append(f'linkcheck_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {cumulative}')
+        lines.append(f'linkcheck_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {int(fields.get("count", 0))}')
+        lines.append(f'linkcheck_phase_seconds_sum{{phase="{phase}"}} {_format_value(float(fields.get("sum", 0)))}')
+        lines.append(f'linkcheck_phase_seconds_count{{phase="{phase}"}} {int(fields.get("count", 0))}')
+
+    for name, value in sorted(counters.items()):
+        lines.append(f"# TYPE linkcheck_{name}_total counter")
+        lines.append(f"linkcheck_{name}_total {int(value)}")
+
+    # Scans that stopped reporting (e.g. a killed worker) no longer count
+    now = time.time()
+    sizes = {}
+    for task_id, entry in frontier.items():
+        size, updated_at = json.loads(entry)
+        if now - updated_at <= settings.METRICS_GAUGE_TTL:
+            sizes[task_id] = size
+    stale = [task_id for task_id in frontier if task_id not in sizes]
+    if stale:
+        redis.hdel(metrics_key("frontier"), *stale)
+    lines += [
+        "# HELP linkcheck_active_scans Scans reporting their frontier.",
+        "# TYPE linkcheck_active_scans gauge",
+        f"linkcheck_active_scans {len(sizes)}",
+        "# HELP linkcheck_frontier_urls URLs waiting in the frontiers of the running scans.",
+        "# TYPE linkcheck_frontier_urls gauge",
+        f"linkcheck_frontier_urls {sum(sizes.values())}",
+        "# HELP linkcheck_queue_length Tasks waiting in a Celery queue.",
+        "# TYPE linkcheck_queue_length gauge",
+    ]
+    for queue, depth in zip(QUEUES, depths):
+        lines.append(f'linkcheck_queue_length{{queue="{queue}"}} {depth}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,78 @@
+import asyncio
+import atexit
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.core.config import settings
+from app.utils.link_extractor import get_link_extractor
+
+PARSE_EXECUTOR_MODES = ("inline", "thread", "process")
+
+
+def extract_links(body, encoding, page_url, engine, include_assets):
+    """Decode a raw page body and return its absolute links; runs inside the executor."""
+    extractor = get_link_extractor(engine, include_assets)
+    extractor.feed(body.decode(encoding or "utf-8", errors="replace"))
+    return extractor.links(page_url)
+
+
+class ParseExecutor:
+    """Run link extraction inline on the event loop, in a thread pool or in a process pool."""
+
+    def __init__(self, mode="inline", max_workers=None):
+        if mode not in PARSE_EXECUTOR_MODES:
+            raise ValueError(f"Unknown parse executor: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self._pool = None
+        if mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="parse")
+        elif mode == "process":
+            # Spawned children don't inherit the worker's event loop, sockets or Redis connections
+            self._pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    @property
+    def streaming(self):
+        """Inline extraction parses chunks as they arrive instead of buffering the body."""
+        return self._pool is None
+
+    async def extract_links(self, body, encoding, page_url, engine, include_assets):
+        """Extract links from a raw page body without blocking the event loop."""
+        if self._pool is None:
+            return extract_links(body, encoding, page_url, engine, include_assets)
+        loop = asyncio.get_running_loop()
+        pool = self._pool
+        try:
+            return await loop.run_in_executor(pool, extract_links, body, encoding, page_url, engine, include_assets)
+        except (BrokenProcessPool, AssertionError) as e:
+            # Child processes can't be started from some worker pools (e.g. daemonic processes)
+            if not isinstance(pool, ProcessPoolExecutor):
+                raise
+            if self._pool is pool:
+                logging.warning(f"Process parse executor unavailable, falling back to threads: {e}")
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.mode = "thread"
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="parse")
+            return await loop.run_in_executor(self._pool, extract_links, body, encoding, page_url, engine, include_assets)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_parse_executor = None
+
+
+def get_parse_executor():
+    """Return the parse executor shared by every scan in this worker process."""
+    global _parse_executor
+    if _parse_executor is None:
+        try:
+            _parse_executor = ParseExecutor(settings.PARSE_EXECUTOR, settings.PARSE_WORKERS)
+        except Exception as e:
+            logging.warning(f"Could not start {settings.PARSE_EXECUTOR} parse executor, parsing inline: {e}")
+            _parse_executor = ParseExecutor("inline")
+        atexit.register(_parse_executor.shutdown)
+    return _parse_executor
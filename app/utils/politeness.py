@@ -0,0 +1,223 @@
+import asyncio
+import email.utils
+import logging
+import time
+import weakref
+import httpx
+from app.core.config import settings
+from app.utils.http_pool import get_http_pool
+
+# Responses telling the client to slow down
+THROTTLE_STATUSES = {429, 503}
+
+_throttles = weakref.WeakKeyDictionary()
+
+
+def parse_retry_after(value):
+    """Return the delay in seconds requested by a Retry-After header, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class HostThrottle:
+    """Token bucket and in-flight limit for the requests to one host.
+
+    The request rate is cut by DECREASE whenever the host answers 429 or
+    503, and grows back by INCREASE of the maximum rate with every other
+    response, so the crawl settles at the fastest rate the host accepts.
+    """
+
+    DECREASE = 0.5
+    INCREASE = 0.05
+
+    # Requests holding an in-flight slot across every throttle of the process
+    in_flight = 0
+
+    def __init__(self, max_rate, min_rate, max_in_flight):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = max_rate
+        self.burst = max_in_flight
+        self.tokens = float(max_in_flight)
+        self.not_before = 0.0
+        # Requests holding a slot of this host
+        self.active = 0
+        self.capped = False
+        self._updated = time.monotonic()
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait for an in-flight slot and a token; release() gives the slot back."""
+        await self._slots.acquire()
+        try:
+            while True:
+                now = time.monotonic()
+                if now < self.not_before:
+                    await asyncio.sleep(self.not_before - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.active += 1
+                    HostThrottle.in_flight += 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self):
+        self.active -= 1
+        HostThrottle.in_flight -= 1
+        self._slots.release()
+
+    def idle(self):
+        """Return True if a new throttle would behave the same: no request, pause, slowdown or cap."""
+        return not self.active and not self.capped and self.rate >= self.max_rate and time.monotonic() >= self.not_before
+
+    def limit_rate(self, max_rate):
+        """Lower the maximum rate, e.g. to honor a robots.txt Crawl-delay."""
+        self.capped = True
+        self.max_rate = min(self.max_rate, max_rate)
+        self.min_rate = min(self.min_rate, self.max_rate)
+        self.rate = min(self.rate, self.max_rate)
+        self.burst = 1
+        self.tokens = min(self.tokens, 1)
+
+    def throttled(self, delay):
+        """Slow down after a 429/503 and pause the host for `delay` seconds."""
+        self._refill(time.monotonic())
+        self.rate = max(self.min_rate, self.rate * self.DECREASE)
+        self.tokens = 0.0
+        self.not_before = max(self.not_before, time.monotonic() + delay)
+
+    def succeeded(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * self.INCREASE)
+
+
+class HostThrottles:
+    """The HostThrottle of each host, shared by the scans running on one event loop.
+
+    Once `max_size` hosts are known, the throttles of idle hosts are dropped
+    before adding another.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or settings.HOST_THROTTLE_CACHE_SIZE
+        self._hosts = {}
+
+    def __len__(self):
+        return len(self._hosts)
+
+    def get(self, host, max_rate, min_rate, max_in_flight):
+        """Return the throttle of a host, creating it with these limits on first use."""
+        throttle = self._hosts.get(host)
+        if throttle is None:
+            if len(self._hosts) >= self.max_size:
+                self._hosts = {name: kept for name, kept in self._hosts.items() if not kept.idle()}
+            throttle = self._hosts[host] = HostThrottle(max_rate, min_rate, max_in_flight)
+        return throttle
+
+
+def get_host_throttles():
+    """Return the host throttles of the running event loop, creating them on first use."""
+    loop = asyncio.get_running_loop()
+    throttles = _throttles.get(loop)
+    if throttles is None:
+        throttles = _throttles[loop] = HostThrottles()
+    return throttles
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that frees the host's in-flight slot once closed."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release:
+                self._release()
+                self._release = None
+
+
+class PoliteTransport(httpx.AsyncBaseTransport):
+    """HTTP transport applying a HostThrottle to every host it talks to.
+
+    Requests go through the worker's shared connection pool unless another
+    transport is given, and the throttles are shared with every other scan on
+    the event loop (see get_host_throttles) unless `throttles` is given, so
+    concurrent and successive scans of a worker respect each host's limits
+    together; the limits given here only apply to the throttles it creates.
+    A request holds its host's in-flight slot until the response body is
+    closed. 429 and 503 responses are retried up to THROTTLE_MAX_RETRIES
+    times, after the Retry-After delay when the host sends one (up to
+    RETRY_AFTER_MAX seconds) and with exponential backoff otherwise.
+    """
+
+    def __init__(self, transport=None, max_rate=None, min_rate=None, max_in_flight=None, max_retries=None,
+                 throttles=None):
+        # The shared pool outlives the scan, so only a transport of our own is closed
+        self._owns_transport = transport is not None
+        self._transport = transport or get_http_pool()
+        self.max_rate = max_rate or settings.HOST_MAX_RATE
+        self.min_rate = min_rate or settings.HOST_MIN_RATE
+        self.max_in_flight = max_in_flight or settings.HOST_MAX_IN_FLIGHT
+        self.max_retries = settings.THROTTLE_MAX_RETRIES if max_retries is None else max_retries
+        self.throttled_responses = 0
+        self._throttles = throttles if throttles is not None else get_host_throttles()
+
+    def host(self, host):
+        """Return the throttle of a host, creating it on first use."""
+        return self._throttles.get(host, self.max_rate, self.min_rate, self.max_in_flight)
+
+    async def handle_async_request(self, request):
+        throttle = self.host(request.url.host)
+        attempt = 0
+        while True:
+            await throttle.acquire()
+            try:
+                response = await self._transport.handle_async_request(request)
+            except BaseException:
+                throttle.release()
+                raise
+
+            if response.status_code not in THROTTLE_STATUSES:
+                throttle.succeeded()
+                break
+            self.throttled_responses += 1
+            retry_after = parse_retry_after(response.headers.get("retry-after"))
+            delay = retry_after if retry_after is not None else settings.THROTTLE_BACKOFF * 2 ** attempt
+            throttle.throttled(min(delay, settings.RETRY_AFTER_MAX))
+            if attempt >= self.max_retries or delay > settings.RETRY_AFTER_MAX:
+                break
+            logging.warning(f"{request.url.host} answered {response.status_code}, retrying {request.url} in {delay:.1f}s")
+            await response.aclose()
+            throttle.release()
+            attempt += 1
+
+        response.stream = _ReleasingStream(response.stream, throttle.release)
+        return response
+
+    async def aclose(self):
+        if self._owns_transport:
+            await self._transport.aclose()
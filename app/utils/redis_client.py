@@ -1,4 +1,5 @@
 import redis
+import redis.asyncio
 import ssl
 from app.core.config import settings
 
@@ -18,4 +19,14 @@ def get_redis_client():
                 settings.REDIS_URL,
                 decode_responses=True
             )
-        )
\ No newline at end of file
+        )
+
+def get_async_redis_client():
+    """Return an asyncio Redis client; it is bound to the running event loop, so close it with aclose().
+
+    The client owns its connection pool, so aclose() also closes its connections.
+    """
+    if settings.REDIS_URL.startswith('rediss://'):
+        return redis.asyncio.Redis.from_url(settings.REDIS_URL, decode_responses=True, ssl_cert_reqs=ssl.CERT_NONE)
+    else:
+        return redis.asyncio.Redis.from_url(settings.REDIS_URL, decode_responses=True)
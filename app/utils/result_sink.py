@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+from collections import Counter
+from app.core.config import settings
+from app.utils.scan_summary import add_summary_updates, count_record
+from app.utils.result_stream import add_event, expire_stream, result_event
+from app.utils.result_store import ResultStore
+from app.utils.link_graph import LinkGraph
+from app.utils.metrics import metrics, push_metrics, clear_frontier_gauge
+
+
+def make_error_result(url, parent_url, error_msg, link_type="internal"):
+    """Build the result record stored for an error."""
+    return {
+        "url": url,
+        "status": "error",
+        "type": link_type,
+        "parent": parent_url,
+        "details": error_msg
+    }
+
+
+class ResultSink:
+    """Buffer scan results and append them to the task's ResultStore in pipelined batches.
+
+    Records are flushed when `batch_size` of them are buffered or every
+    `flush_interval` seconds, and a final flush always runs when the sink is
+    closed, whether the crawl completed or failed. Use as an async context manager.
+
+    The scan's summary counters are updated in the same transaction as the
+    records are appended; `gauges`, if given, returns extra summary values
+    (e.g. the frontier size) to store with each flush. Every flushed record
+    is also published on the task's Redis Stream as a "result" event
+    carrying its index, followed by a "progress" event.
+
+    `on_pending`, if given, is awaited after each flush with the index and
+    record of every stored "pending" result, so a later check can update it.
+
+    Each flush also writes the scan's LinkGraph updates, available as `graph`.
+    The process's metrics are pushed after every periodic flush, with the
+    frontier size from `gauges` while the scan runs.
+    """
+
+    def __init__(self, task_id, redis, batch_size=None, flush_interval=None, written=0, on_pending=None,
+                 totals=None, gauges=None, retention=None):
+        self.task_id = task_id
+        self.redis = redis
+        self.store = ResultStore(redis, task_id, retention)
+        self.graph = LinkGraph(redis, task_id, retention)
+        self.on_pending = on_pending
+        self.gauges = gauges
+        self.batch_size = batch_size or settings.RESULT_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.RESULT_FLUSH_INTERVAL
+        # Records already stored for the task (when resuming) count as written and added
+        self.written = written
+        self.added = written
+        # Summary counters of every record added so far, for checkpoints
+        self.totals = Counter(totals or {})
+        self._buffer = []
+        self._counts = Counter()
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._flusher = None
+        self._closing = False
+
+    async def __aenter__(self):
+        self._flusher = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def add(self, record):
+        """Queue a result record for writing without waiting on Redis."""
+        self._buffer.append(record)
+        self.added += 1
+        count_record(self.totals, record)
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    def count(self, name, value=1):
+        """Increment a summary counter with the next flush, e.g. pages_crawled."""
+        self.totals[name] += value
+        self._counts[name] += value
+
+    def add_error(self, url, parent_url, error_msg, link_type="internal"):
+        """Queue an error record for writing."""
+        self.add(make_error_result(url, parent_url, error_msg, link_type))
+        logging.error(f"Error stored for {url}: {error_msg}")
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error(f"Failed to flush results for {self.task_id}, will retry: {e}")
+            await self._push_metrics()
+
+    async def _push_metrics(self, running=True):
+        try:
+            if running:
+                gauges = self.gauges() if self.gauges else {}
+                await push_metrics(self.redis, self.task_id, gauges.get("frontier_size"))
+            else:
+                await push_metrics(self.redis)
+                await clear_frontier_gauge(self.redis, self.task_id)
+        except Exception as e:
+            logging.error(f"Failed to push metrics for {self.task_id}: {e}")
+
+    async def flush(self):
+        """Write all buffered records to Redis in one pipeline."""
+        async with self._lock:
+            await self.graph.flush()
+            if not self._buffer:
+                return
+            records, self._buffer = self._buffer, []
+            extra, self._counts = self._counts, Counter()
+            rows = [json.dumps(record) for record in records]
+            counts = Counter(extra)
+            for record in records:
+                count_record(counts, record)
+            gauges = self.gauges() if self.gauges else None
+            try:
+                with metrics.timer("result_write"):
+                    first_index = await self.store.append(
+                        records, lambda pipe: add_summary_updates(pipe, self.task_id, counts, gauges)
+                    )
+            except BaseException:
+                # Keep the records, in order, for the next flush attempt (also when cancelled)
+                self._buffer[:0] = records
+                self._counts.update(extra)
+                raise
+            self.written += len(records)
+            metrics.count("results_written", len(records))
+            length = first_index + len(records)
+            try:
+                with metrics.timer("result_seal"):
+                    await self.store.seal()
+            except Exception as e:
+                logging.error(f"Failed to seal results of {self.task_id}: {e}")
+
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for i, row in enumerate(rows):
+                        add_event(pipe, self.task_id, "result", result_event(first_index + i, row))
+                    add_event(pipe, self.task_id, "progress", json.dumps({"results": length}))
+                    expire_stream(pipe, self.task_id)
+                    await pipe.execute()
+            except Exception as e:
+                logging.error(f"Failed to publish results for {self.task_id}: {e}")
+
+            if self.on_pending:
+                pending = [(first_index + i, record) for i, record in enumerate(records) if record["status"] == "pending"]
+                if pending:
+                    try:
+                        await self.on_pending(pending)
+                    except Exception as e:
+                        logging.error(f"Failed to handle pending results for {self.task_id}: {e}")
+
+    async def close(self):
+        """Stop the periodic flusher and write everything still buffered."""
+        if self._flusher is not None:
+            self._closing = True
+            self._wake.set()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        try:
+            await self.flush()
+        finally:
+            await self._push_metrics(running=False)
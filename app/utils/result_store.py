@@ -0,0 +1,274 @@
+import base64
+import json
+import zlib
+from redis.exceptions import WatchError
+from app.core.config import settings
+
+RESULTS_PREFIX = "results:"
+CHUNK_SIZE = 256
+# Stored as their index: new types are appended
+LINK_TYPES = ("internal", "external", "url")
+
+
+def results_key(task_id, name):
+    return f"{RESULTS_PREFIX}{task_id}:{name}"
+
+
+def pack_record(record):
+    """Encode a result record as a compact JSON array."""
+    return json.dumps([
+        record["url"],
+        record["status"],
+        LINK_TYPES.index(record["type"]),
+        record["parent"],
+        record["details"],
+        record.get("cached"),
+    ], separators=(",", ":"))
+
+
+def unpack_record(row):
+    url, status, link_type, parent, details, cached = json.loads(row)
+    record = {"url": url, "status": status, "type": LINK_TYPES[link_type], "parent": parent, "details": details}
+    if cached is not None:
+        record["cached"] = cached
+    return record
+
+
+def encode_chunk(rows):
+    """Compress packed rows into a chunk, dictionary-encoding parent URLs and details."""
+    parents, details, records = {}, {}, []
+    for row in rows:
+        url, status, link_type, parent, detail, cached = json.loads(row)
+        records.append([url, status, link_type, parents.setdefault(parent, len(parents)),
+                        details.setdefault(detail, len(details)), cached])
+    payload = json.dumps({"p": list(parents), "d": list(details), "r": records}, separators=(",", ":"))
+    # The Redis clients decode responses, so the compressed bytes are stored as text
+    return base64.b85encode(zlib.compress(payload.encode(), 6)).decode()
+
+
+def decode_chunk(chunk):
+    """Return the packed rows of a chunk."""
+    payload = json.loads(zlib.decompress(base64.b85decode(chunk)))
+    parents, details = payload["p"], payload["d"]
+    return [
+        json.dumps([url, status, link_type, parents[parent], details[detail], cached], separators=(",", ":"))
+        for url, status, link_type, parent, detail, cached in payload["r"]
+    ]
+
+
+class ResultStore:
+    """Compact, expiring storage of a scan's result records in Redis.
+
+    Records are stored as JSON arrays rather than objects and appended to an
+    open "tail" list; every CHUNK_SIZE records are sealed into a compressed
+    chunk where parent URLs and details are dictionary-encoded. Records
+    rewritten later (e.g. by a Selenium check) go to an overrides hash that
+    is applied on read, so sealed chunks never change. Every key expires
+    after the scan's retention.
+    """
+
+    def __init__(self, redis, task_id, retention=None):
+        self.redis = redis
+        self.task_id = task_id
+        self.retention = retention
+        self.chunks_key = results_key(task_id, "chunks")
+        self.tail_key = results_key(task_id, "tail")
+        self.updates_key = results_key(task_id, "updates")
+        self.meta_key = results_key(task_id, "meta")
+        # Length of the tail after the last append, to know when a chunk can be sealed
+        self.tail_length = 0
+
+    async def _retention(self):
+        if self.retention is None:
+            stored = await self.redis.hget(self.meta_key, "retention")
+            self.retention = int(stored) if stored else settings.RESULT_RETENTION
+        return self.retention
+
+    def _expire(self, pipe, retention):
+        pipe.hset(self.meta_key, "retention", retention)
+        for key in (self.chunks_key, self.tail_key, self.updates_key, self.meta_key):
+            pipe.expire(key, retention)
+
+    async def append(self, records, extra=None):
+        """Append records atomically and return the index of the first one; call seal() afterwards.
+
+        `extra(pipe)`, if given, queues more commands in the same transaction.
+        """
+        retention = await self._retention()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(self.tail_key, *(pack_record(record) for record in records))
+            pipe.llen(self.chunks_key)
+            if extra:
+                extra(pipe)
+            self._expire(pipe, retention)
+            replies = await pipe.execute()
+        self.tail_length, chunk_count = replies[0], replies[1]
+        return chunk_count * CHUNK_SIZE + self.tail_length - len(records)
+
+    async def seal(self):
+        """Compress every full chunk of the tail; concurrent appends make it retry."""
+        if self.tail_length < CHUNK_SIZE:
+            return
+        self.tail_length = 0
+        retention = await self._retention()
+        while True:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(self.tail_key)
+                    rows = await pipe.lrange(self.tail_key, 0, CHUNK_SIZE - 1)
+                    if len(rows) < CHUNK_SIZE:
+                        return
+                    pipe.multi()
+                    pipe.rpush(self.chunks_key, encode_chunk(rows))
+                    pipe.ltrim(self.tail_key, CHUNK_SIZE, -1)
+                    # The first seal creates the chunks list, after append() set the TTLs
+                    pipe.expire(self.chunks_key, retention)
+                    await pipe.execute()
+                except WatchError:
+                    continue
+
+    async def count(self):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.llen(self.chunks_key)
+            pipe.llen(self.tail_key)
+            chunk_count, tail_length = await pipe.execute()
+        return chunk_count * CHUNK_SIZE + tail_length
+
+    async def get(self, index):
+        """Return the record stored at `index`, or None."""
+        update = await self.redis.hget(self.updates_key, index)
+        if update:
+            return unpack_record(update)
+        chunk_index, offset = divmod(index, CHUNK_SIZE)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lindex(self.chunks_key, chunk_index)
+            pipe.llen(self.chunks_key)
+            pipe.lrange(self.tail_key, 0, -1)
+            chunk, chunk_count, tail = await pipe.execute()
+        if chunk is not None:
+            rows = decode_chunk(chunk)
+        else:
+            rows = tail if chunk_index == chunk_count else []
+            offset = index - chunk_count * CHUNK_SIZE
+        return unpack_record(rows[offset]) if 0 <= offset < len(rows) else None
+
+    async def update(self, index, record, extra=None):
+        """Replace the record at `index`; `extra(pipe)` queues more commands in the same transaction."""
+        retention = await self._retention()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.updates_key, index, pack_record(record))
+            if extra:
+                extra(pipe)
+            self._expire(pipe, retention)
+            await pipe.execute()
+
+    async def truncate(self, length):
+        """Drop every record from `length` on; only safe while nothing else writes to the scan."""
+        retention = await self._retention()
+        chunk_count = await self.redis.llen(self.chunks_key)
+        sealed, kept = divmod(length, CHUNK_SIZE)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if sealed < chunk_count:
+                rows = decode_chunk(await self.redis.lindex(self.chunks_key, sealed))[:kept]
+                if sealed:
+                    pipe.ltrim(self.chunks_key, 0, sealed - 1)
+                else:
+                    pipe.delete(self.chunks_key)
+                pipe.delete(self.tail_key)
+                if rows:
+                    pipe.rpush(self.tail_key, *rows)
+            else:
+                kept = length - chunk_count * CHUNK_SIZE
+                if kept:
+                    pipe.ltrim(self.tail_key, 0, kept - 1)
+                else:
+                    pipe.delete(self.tail_key)
+            dropped = [index for index in await self.redis.hkeys(self.updates_key) if int(index) >= length]
+            if dropped:
+                pipe.hdel(self.updates_key, *dropped)
+            # The tail may have been rebuilt from a chunk
+            self._expire(pipe, retention)
+            await pipe.execute()
+
+    async def delete(self):
+        await self.redis.delete(self.chunks_key, self.tail_key, self.updates_key, self.meta_key)
+
+
+def _stored_retention(redis, task_id):
+    stored = redis.hget(results_key(task_id, "meta"), "retention")
+    return int(stored) if stored else settings.RESULT_RETENTION
+
+
+def count_records(redis, task_id):
+    """Return the number of records stored for a scan (synchronous client)."""
+    with redis.pipeline(transaction=True) as pipe:
+        pipe.llen(results_key(task_id, "chunks"))
+        pipe.llen(results_key(task_id, "tail"))
+        chunk_count, tail_length = pipe.execute()
+    return chunk_count * CHUNK_SIZE + tail_length
+
+
+def append_record(redis, task_id, record, extra=None):
+    """Append one record with a synchronous client and return its index; the next async append seals the tail."""
+    store = ResultStore(redis, task_id, _stored_retention(redis, task_id))
+    with redis.pipeline(transaction=True) as pipe:
+        pipe.rpush(store.tail_key, pack_record(record))
+        pipe.llen(store.chunks_key)
+        if extra:
+            extra(pipe)
+        store._expire(pipe, store.retention)
+        tail_length, chunk_count = pipe.execute()[:2]
+    return chunk_count * CHUNK_SIZE + tail_length - 1
+
+
+def read_record(redis, task_id, index):
+    """Return the record stored at `index` with a synchronous client, or None."""
+    return next((record for _, record in iter_records(redis, task_id, index, index + 1)), None)
+
+
+def update_record(redis, task_id, index, record, extra=None):
+    """Replace the record at `index` with a synchronous client."""
+    store = ResultStore(redis, task_id, _stored_retention(redis, task_id))
+    with redis.pipeline(transaction=True) as pipe:
+        pipe.hset(store.updates_key, index, pack_record(record))
+        if extra:
+            extra(pipe)
+        store._expire(pipe, store.retention)
+        pipe.execute()
+
+
+def iter_records(redis, task_id, start, end):
+    """Yield (index, record) for records start..end-1 of a scan (synchronous client).
+
+    Sealed chunks are read RESULTS_READ_CHUNK records at a time, and
+    overridden records are replaced by their latest version.
+    """
+    chunks_key, tail_key, updates_key = (results_key(task_id, name) for name in ("chunks", "tail", "updates"))
+    has_updates = redis.exists(updates_key)
+    step = max(1, settings.RESULTS_READ_CHUNK // CHUNK_SIZE)
+    index = start
+    while index < end:
+        first_chunk = index // CHUNK_SIZE
+        with redis.pipeline(transaction=True) as pipe:
+            pipe.lrange(chunks_key, first_chunk, min(first_chunk + step, -(-end // CHUNK_SIZE)) - 1)
+            pipe.llen(chunks_key)
+            pipe.lrange(tail_key, 0, -1)
+            chunks, chunk_count, tail = pipe.execute()
+
+        if chunks:
+            base = first_chunk * CHUNK_SIZE
+            rows = [row for chunk in chunks for row in decode_chunk(chunk)]
+        else:
+            base = chunk_count * CHUNK_SIZE
+            rows = tail
+        stop = min(end, base + len(rows))
+        if stop <= index:
+            return
+
+        updates = {}
+        if has_updates:
+            indices = list(range(index, stop))
+            updates = {i: row for i, row in zip(indices, redis.hmget(updates_key, indices)) if row}
+        for i in range(index, stop):
+            yield i, unpack_record(updates.get(i) or rows[i - base])
+        index = stop
@@ -0,0 +1,41 @@
+import json
+from app.core.config import settings
+
+RESULT_STREAM_PREFIX = "stream:"
+
+# Statuses after which a scan publishes nothing more
+FINAL_STATUSES = ("SUCCESS", "FAILURE", "REVOKED")
+
+
+def result_stream_key(task_id):
+    return f"{RESULT_STREAM_PREFIX}{task_id}"
+
+
+def result_event(index, row):
+    """Serialize a "result" event from a stored row without decoding it again."""
+    return f'{{"index": {index}, "result": {row}}}'
+
+
+def add_event(pipe, task_id, event, data):
+    """Queue an event on the task's Redis Stream; `data` is a JSON string. Follow with expire_stream()."""
+    pipe.xadd(result_stream_key(task_id), {"event": event, "data": data}, maxlen=settings.RESULT_STREAM_MAXLEN, approximate=True)
+
+
+def expire_stream(pipe, task_id):
+    pipe.expire(result_stream_key(task_id), settings.RESULT_STREAM_TTL)
+
+
+def publish_event(redis, task_id, event, data):
+    """Publish one event with a synchronous Redis client; `data` is JSON-serialized."""
+    with redis.pipeline(transaction=False) as pipe:
+        add_event(pipe, task_id, event, json.dumps(data))
+        expire_stream(pipe, task_id)
+        pipe.execute()
+
+
+async def publish_event_async(redis, task_id, event, data):
+    """Publish one event with an asyncio Redis client; `data` is JSON-serialized."""
+    async with redis.pipeline(transaction=False) as pipe:
+        add_event(pipe, task_id, event, json.dumps(data))
+        expire_stream(pipe, task_id)
+        await pipe.execute()
@@ -0,0 +1,43 @@
+import logging
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+import httpx
+from app.core.config import settings
+
+ROBOTS_CACHE_PREFIX = "robots:"
+
+
+class RobotsRules:
+    """Parsed robots.txt of a site, matched against the crawler's user agent."""
+
+    def __init__(self, text):
+        self._parser = RobotFileParser()
+        self._parser.parse(text.splitlines())
+        delay = self._parser.crawl_delay(settings.USER_AGENT)
+        self.crawl_delay = float(delay) if delay else None
+        self.sitemaps = self._parser.site_maps() or []
+
+    def allowed(self, url):
+        return self._parser.can_fetch(settings.USER_AGENT, url)
+
+
+async def get_robots(client, redis, base_url):
+    """Return the robots.txt rules of the site hosting `base_url`, cached per host for ROBOTS_CACHE_TTL.
+
+    A missing or unreachable robots.txt allows everything.
+    """
+    parsed = urlparse(base_url)
+    origin = f"{parsed.scheme}://{parsed.netloc}"
+    cache_key = f"{ROBOTS_CACHE_PREFIX}{origin}"
+
+    text = await redis.get(cache_key)
+    if text is None:
+        try:
+            response = await client.get(f"{origin}/robots.txt")
+            text = response.text if response.status_code == 200 else ""
+            await redis.setex(cache_key, settings.ROBOTS_CACHE_TTL, text)
+        except httpx.HTTPError as e:
+            # Not cached, so the next scan tries again
+            logging.warning(f"Could not fetch robots.txt of {origin}: {e}")
+            text = ""
+    return RobotsRules(text)
@@ -0,0 +1,83 @@
+import time
+from collections import Counter
+from app.core.config import settings
+
+SUMMARY_PREFIX = "summary:"
+
+# Status classes counted as broken links
+BROKEN_CLASSES = ("4xx", "5xx", "error")
+
+# Summary fields that are not counters
+SUMMARY_VALUES = ("started_at", "updated_at", "frontier_size", "urls_seen")
+
+
+def summary_key(task_id):
+    return f"{SUMMARY_PREFIX}{task_id}"
+
+
+def status_class(status):
+    """Return the class a result status is counted and filtered by: "2xx", "4xx", ... or the status itself (error, pending...)."""
+    if isinstance(status, int):
+        return f"{status // 100}xx"
+    return str(status)
+
+
+def count_record(counts, record):
+    """Add a result record to the summary counters."""
+    counts["links_checked"] += 1
+    counts[record["type"]] += 1
+    counts[f"status:{status_class(record['status'])}"] += 1
+
+
+def add_summary_updates(pipe, task_id, counts, gauges=None):
+    """Queue the counter increments and gauge values of a write on the task's summary hash."""
+    key = summary_key(task_id)
+    for name, value in counts.items():
+        if value:
+            pipe.hincrby(key, name, value)
+    now = time.time()
+    pipe.hsetnx(key, "started_at", now)
+    pipe.hset(key, mapping={"updated_at": now, **(gauges or {})})
+    pipe.expire(key, settings.SUMMARY_TTL)
+
+
+def move_status_count(pipe, task_id, old_status, new_status):
+    """Queue moving one result from a status class to another, e.g. after its Selenium check."""
+    key = summary_key(task_id)
+    pipe.hincrby(key, f"status:{status_class(old_status)}", -1)
+    pipe.hincrby(key, f"status:{status_class(new_status)}", 1)
+
+
+async def reset_summary_counts(redis, task_id, totals):
+    """Set the summary counters back to `totals`, when a resumed scan drops the results stored after its checkpoint."""
+    key = summary_key(task_id)
+    fields = await redis.hkeys(key)
+    counters = {name: 0 for name in fields if name not in SUMMARY_VALUES}
+    counters.update(totals)
+    if counters:
+        await redis.hset(key, mapping=counters)
+
+
+def format_summary(task_id, fields):
+    """Turn the raw summary hash of a scan into the /summary response."""
+    fields = dict(fields)
+    started_at = float(fields.pop("started_at", 0) or 0)
+    updated_at = float(fields.pop("updated_at", 0) or 0)
+    counts = Counter({name: int(float(value)) for name, value in fields.items()})
+    by_status = {name.split(":", 1)[1]: value for name, value in counts.items() if name.startswith("status:") and value}
+    elapsed = updated_at - started_at
+    return {
+        "task_id": task_id,
+        "pages_crawled": counts["pages_crawled"],
+        "links_checked": counts["links_checked"],
+        "internal": counts["internal"],
+        "external": counts["external"],
+        "by_status": by_status,
+        "broken": sum(by_status.get(name, 0) for name in BROKEN_CLASSES),
+        "pending_selenium": by_status.get("pending", 0),
+        "frontier_size": counts["frontier_size"] if "frontier_size" in fields else None,
+        "urls_seen": counts["urls_seen"] if "urls_seen" in fields else None,
+        "pages_per_sec": round(counts["pages_crawled"] / elapsed, 2) if elapsed > 0 else None,
+        "started_at": started_at or None,
+        "updated_at": updated_at or None,
+    }
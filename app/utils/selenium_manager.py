@@ -1,12 +1,53 @@
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.firefox.service import Service
+from contextlib import contextmanager
+from app.core.config import settings
 import logging
 import os
+import queue
 import threading
+import time
 import subprocess
 
+# Resolves once the page has loaded and no resource request was started for
+# `idleMs` milliseconds, instead of sleeping for a fixed time.
+NETWORK_IDLE_SCRIPT = """
+const idleMs = arguments[0];
+const done = arguments[arguments.length - 1];
+let timer;
+const arm = () => {
+    clearTimeout(timer);
+    timer = setTimeout(() => done(document.readyState), idleMs);
+};
+const start = () => {
+    arm();
+    new PerformanceObserver(arm).observe({type: "resource"});
+};
+if (document.readyState === "complete") {
+    start();
+} else {
+    window.addEventListener("load", start, {once: true});
+}
+"""
+
+
+class PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.pages = 0
+
+    def expired(self):
+        return (
+            self.pages >= settings.SELENIUM_DRIVER_MAX_PAGES
+            or time.monotonic() - self.created_at >= settings.SELENIUM_DRIVER_MAX_AGE
+        )
+
+
 class SeleniumManager:
+    """Per-process pool of warm Firefox drivers shared by the worker's threads."""
+
     _instances = {}
     _lock = threading.Lock()
 
@@ -15,7 +56,9 @@ class SeleniumManager:
         with cls._lock:
             if pid not in cls._instances:
                 instance = super(SeleniumManager, cls).__new__(cls)
-                instance._driver = None
+                instance._idle = queue.LifoQueue()
+                instance._size = 0
+                instance._size_lock = threading.Lock()
                 cls._instances[pid] = instance
             return cls._instances[pid]
 
@@ -37,16 +80,73 @@ class SeleniumManager:
             return False
 
     @classmethod
-    def get_instance(cls):
+    def warm(cls, size=None):
+        """Start drivers until the pool holds `size` of them (default SELENIUM_POOL_SIZE)."""
+        instance = cls()
+        size = size or settings.SELENIUM_POOL_SIZE
+        while True:
+            with instance._size_lock:
+                if instance._size >= size:
+                    return
+                instance._size += 1
+            try:
+                instance._idle.put(PooledDriver(instance._create_driver()))
+            except Exception:
+                with instance._size_lock:
+                    instance._size -= 1
+                raise
+
+    @classmethod
+    @contextmanager
+    def driver(cls):
+        """Borrow a driver from the pool, starting one if fewer than SELENIUM_POOL_SIZE exist.
+
+        Drivers are recycled after SELENIUM_DRIVER_MAX_PAGES pages or
+        SELENIUM_DRIVER_MAX_AGE seconds, and discarded if the check failed.
+        """
         instance = cls()
-        if instance._driver is None:
-            instance._driver = instance._create_driver()
-        return instance._driver
+        pooled = instance._acquire()
+        healthy = False
+        try:
+            yield pooled.driver
+            healthy = True
+        finally:
+            pooled.pages += 1
+            if healthy and not pooled.expired():
+                instance._idle.put(pooled)
+            else:
+                instance._retire(pooled)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._size_lock:
+            can_start = self._size < settings.SELENIUM_POOL_SIZE
+            if can_start:
+                self._size += 1
+        if not can_start:
+            return self._idle.get()
+        try:
+            return PooledDriver(self._create_driver())
+        except Exception:
+            with self._size_lock:
+                self._size -= 1
+            raise
+
+    def _retire(self, pooled):
+        with self._size_lock:
+            self._size -= 1
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logging.error(f"Error closing WebDriver: {e}")
 
     def _create_driver(self):
         """Create a new WebDriver instance."""
         logging.info(f"Initializing new WebDriver for process {os.getpid()}...")
-        
+
         options = Options()
         options.set_preference("browser.cache.disk.enable", False)
         options.set_preference("browser.cache.memory.enable", False)
@@ -59,6 +159,18 @@ class SeleniumManager:
         options.set_preference("browser.helperApps.neverAsk.saveToDisk", "text/csv")
         options.set_preference("pdfjs.disabled", True)
 
+        # Don't download images, web fonts or media: only reachability matters
+        options.set_preference("permissions.default.image", 2)
+        options.set_preference("browser.display.use_document_fonts", 0)
+        options.set_preference("gfx.downloadable_fonts.enabled", False)
+        options.set_preference("media.autoplay.default", 5)
+        options.set_preference("media.autoplay.blocking_policy", 2)
+        options.set_preference("media.preload.default", 0)
+        options.set_preference("media.preload.auto", 0)
+
+        # Return from get() at DOMContentLoaded; readiness is awaited with NETWORK_IDLE_SCRIPT
+        options.page_load_strategy = "eager"
+
         options.add_argument("--headless")
         options.add_argument("--no-sandbox")
         options.add_argument("--width=1920")
@@ -66,40 +178,46 @@ class SeleniumManager:
         options.set_preference("dom.webdriver.enabled", False)
         options.set_preference("media.navigator.permission.disabled", True)
         options.set_preference("network.http.use-cache", False)
-        
+
         try:
             service = Service(
                 executable_path="/usr/local/bin/geckodriver",
                 log_path=os.devnull
             )
-            
+
             driver = webdriver.Firefox(
                 options=options,
                 service=service
             )
-            
+
             # Set reasonable timeouts
             driver.set_page_load_timeout(60)
+            driver.set_script_timeout(settings.SELENIUM_READY_TIMEOUT)
             driver.implicitly_wait(10)
-            
+
             logging.info("WebDriver initialized successfully")
             return driver
-            
+
         except Exception as e:
             logging.error(f"Failed to initialize WebDriver: {e}")
             raise
 
+    @classmethod
+    def wait_until_ready(cls, driver):
+        """Wait for the load event followed by SELENIUM_NETWORK_IDLE_MS without new requests."""
+        return driver.execute_async_script(NETWORK_IDLE_SCRIPT, settings.SELENIUM_NETWORK_IDLE_MS)
+
     @classmethod
     def close(cls):
+        """Quit every idle driver of this process's pool."""
         pid = os.getpid()
         with cls._lock:
-            if pid in cls._instances:
-                instance = cls._instances[pid]
-                if instance._driver is not None:
-                    try:
-                        instance._driver.quit()
-                    except Exception as e:
-                        logging.error(f"Error closing WebDriver: {e}")
-                    finally:
-                        instance._driver = None
-                        del cls._instances[pid]
\ No newline at end of file
+            instance = cls._instances.get(pid)
+        if instance is None:
+            return
+        while True:
+            try:
+                pooled = instance._idle.get_nowait()
+            except queue.Empty:
+                break
+            instance._retire(pooled)
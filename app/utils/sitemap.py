@@ -0,0 +1,84 @@
+import logging
+import zlib
+import httpx
+from xml.etree.ElementTree import XMLPullParser, ParseError
+from app.core.config import settings
+
+GZIP_MAGIC = b"\x1f\x8b"
+DECOMPRESS_CHUNK = 1 << 16
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+async def _iter_body(response):
+    """Yield the decoded body of a sitemap response, gunzipping .gz sitemaps served without Content-Encoding."""
+    decompressor = None
+    size = 0
+    async for chunk in response.aiter_bytes():
+        if decompressor is None:
+            decompressor = zlib.decompressobj(wbits=31) if chunk.startswith(GZIP_MAGIC) else False
+        if decompressor:
+            data = decompressor.decompress(chunk, DECOMPRESS_CHUNK)
+            while True:
+                size += len(data)
+                if size > settings.SITEMAP_MAX_BYTES:
+                    raise ValueError(f"sitemap larger than {settings.SITEMAP_MAX_BYTES} bytes")
+                yield data
+                if not decompressor.unconsumed_tail:
+                    break
+                data = decompressor.decompress(decompressor.unconsumed_tail, DECOMPRESS_CHUNK)
+        else:
+            size += len(chunk)
+            if size > settings.SITEMAP_MAX_BYTES:
+                raise ValueError(f"sitemap larger than {settings.SITEMAP_MAX_BYTES} bytes")
+            yield chunk
+
+
+async def iter_sitemap(client, url):
+    """Stream one sitemap, yielding ("url", loc) for pages and ("sitemap", loc) for nested sitemaps.
+
+    Entries are parsed incrementally and discarded once yielded, so memory
+    stays flat however many entries the sitemap holds.
+    """
+    parser = XMLPullParser(events=("start", "end"))
+    root = None
+    async with client.stream("GET", url, follow_redirects=True) as response:
+        if response.status_code != 200:
+            logging.info(f"No sitemap at {url} ({response.status_code})")
+            return
+        async for data in _iter_body(response):
+            parser.feed(data)
+            for event, element in parser.read_events():
+                if event == "start":
+                    if root is None:
+                        root = element
+                    continue
+                kind = _local_name(element.tag)
+                if kind not in ("url", "sitemap"):
+                    continue
+                loc = next((child.text for child in element if _local_name(child.tag) == "loc"), None)
+                # Drop the finished entries so the tree never grows
+                root.clear()
+                if loc and loc.strip():
+                    yield kind, loc.strip()
+
+
+async def iter_sitemap_urls(client, sitemap_urls):
+    """Yield (page URL, sitemap URL) pairs from the given sitemaps, following indexes up to SITEMAP_MAX_FILES sitemaps."""
+    queue = list(dict.fromkeys(sitemap_urls))
+    seen = set(queue)
+    fetched = 0
+    while queue and fetched < settings.SITEMAP_MAX_FILES:
+        sitemap_url = queue.pop(0)
+        fetched += 1
+        try:
+            async for kind, loc in iter_sitemap(client, sitemap_url):
+                if kind == "url":
+                    yield loc, sitemap_url
+                elif loc not in seen:
+                    seen.add(loc)
+                    queue.append(loc)
+        except (ParseError, ValueError, httpx.HTTPError) as e:
+            logging.warning(f"Skipping the rest of sitemap {sitemap_url}: {e}")
@@ -0,0 +1,166 @@
+import hashlib
+import math
+import sys
+from array import array
+
+VISITED_SET_MODES = ("exact", "fingerprint", "bloom")
+
+
+def url_fingerprint(url):
+    """Return a 64-bit fingerprint of a URL."""
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "little")
+
+
+class ExactVisitedSet:
+    """Visited set holding the full URL strings."""
+
+    def __init__(self):
+        self._urls = set()
+
+    def add(self, url):
+        """Mark a URL as visited; return False if it already was."""
+        if url in self._urls:
+            return False
+        self._urls.add(url)
+        return True
+
+    def __contains__(self, url):
+        return url in self._urls
+
+    def __len__(self):
+        return len(self._urls)
+
+    def memory_bytes(self):
+        return sys.getsizeof(self._urls) + sum(sys.getsizeof(url) for url in self._urls)
+
+    def dump(self):
+        """Serialize the set for a checkpoint."""
+        return "\n".join(self._urls).encode()
+
+    def restore(self, data):
+        """Replace the contents with a set serialized by dump()."""
+        self._urls = set(data.decode().split("\n")) if data else set()
+
+
+class FingerprintVisitedSet:
+    """Visited set holding 64-bit URL fingerprints in a flat open-addressing table.
+
+    Each URL costs 8 bytes per table slot instead of a full string object;
+    two URLs sharing a fingerprint (odds ~n²/2^65) would be treated as one.
+    """
+
+    MAX_LOAD = 0.6
+
+    def __init__(self, initial_slots=1024):
+        self._table = array("Q", bytes(8 * initial_slots))
+        self._count = 0
+
+    def _slot(self, table, fingerprint):
+        mask = len(table) - 1
+        slot = fingerprint & mask
+        while table[slot] and table[slot] != fingerprint:
+            slot = (slot + 1) & mask
+        return slot
+
+    def _grow(self):
+        old_table = self._table
+        self._table = array("Q", bytes(16 * len(old_table)))
+        for fingerprint in old_table:
+            if fingerprint:
+                self._table[self._slot(self._table, fingerprint)] = fingerprint
+
+    def add(self, url):
+        """Mark a URL as visited; return False if it already was."""
+        fingerprint = url_fingerprint(url) or 1  # 0 marks an empty slot
+        slot = self._slot(self._table, fingerprint)
+        if self._table[slot]:
+            return False
+        self._table[slot] = fingerprint
+        self._count += 1
+        if self._count > len(self._table) * self.MAX_LOAD:
+            self._grow()
+        return True
+
+    def __contains__(self, url):
+        fingerprint = url_fingerprint(url) or 1
+        return bool(self._table[self._slot(self._table, fingerprint)])
+
+    def __len__(self):
+        return self._count
+
+    def memory_bytes(self):
+        return sys.getsizeof(self._table)
+
+    def dump(self):
+        """Serialize the set for a checkpoint."""
+        return self._table.tobytes()
+
+    def restore(self, data):
+        """Replace the contents with a set serialized by dump()."""
+        self._table = array("Q")
+        self._table.frombytes(data)
+        self._count = sum(1 for fingerprint in self._table if fingerprint)
+
+
+class BloomVisitedSet:
+    """Visited set backed by a Bloom filter sized for `capacity` URLs at `error_rate`.
+
+    A false positive makes the crawler skip a URL it never visited, so the
+    error rate bounds the share of pages that may be missed. Past `capacity`
+    URLs the actual rate grows above the configured one.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+
+    def _positions(self, url):
+        digest = hashlib.blake2b(url.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, url):
+        """Mark a URL as visited; return False if it (probably) already was."""
+        added = False
+        for position in self._positions(url):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self._bits[byte] & mask:
+                self._bits[byte] |= mask
+                added = True
+        if added:
+            self._count += 1
+        return added
+
+    def __contains__(self, url):
+        return all(self._bits[p >> 3] & (1 << (p & 7)) for p in self._positions(url))
+
+    def __len__(self):
+        return self._count
+
+    def memory_bytes(self):
+        return sys.getsizeof(self._bits)
+
+    def dump(self):
+        """Serialize the filter for a checkpoint."""
+        return self._count.to_bytes(8, "little") + bytes(self._bits)
+
+    def restore(self, data):
+        """Replace the contents with a filter serialized by dump() with the same capacity and error rate."""
+        self._count = int.from_bytes(data[:8], "little")
+        self._bits = bytearray(data[8:])
+
+
+def make_visited_set(mode="exact", capacity=1_000_000, error_rate=0.001):
+    """Create the visited set for a scan."""
+    if mode == "exact":
+        return ExactVisitedSet()
+    if mode == "fingerprint":
+        return FingerprintVisitedSet()
+    if mode == "bloom":
+        return BloomVisitedSet(capacity, error_rate)
+    raise ValueError(f"Unknown visited set: {mode}")
@@ -0,0 +1,159 @@
+"""
+Event loops of the worker processes.
+
+Celery tasks run their coroutines with run_async instead of asyncio.run, so
+what belongs to the loop, like the worker's HTTP connection pool, outlives
+a single task and is reused by the next one.
+
+By default each worker thread keeps its own loop and runs one task at a
+time on it. With ASYNC_WORKER, every task of the process runs on one
+shared loop in a background thread: a threads pool worker then serves as
+many scans at once as its --concurrency, all sharing one connection pool,
+and an AdmissionController holds new scans back while the process is
+busy.
+"""
+import asyncio
+import logging
+import os
+import resource
+import threading
+import time
+from app.core.config import settings
+from app.utils.metrics import metrics
+from app.utils.politeness import HostThrottle
+
+_local = threading.local()
+_shared_lock = threading.Lock()
+_shared = None
+
+
+def current_rss_bytes():
+    """Return the resident memory of the process (its peak where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class AdmissionController:
+    """Start coroutines on the shared loop only while the process has room for more.
+
+    A new scan waits while the requests in flight across the process reach
+    `max_in_flight` or its resident memory reaches `max_rss`, and scans are
+    admitted at most one per `interval` seconds, so the load of each shows
+    before the next is let in. Waiting scans are admitted in arrival order;
+    one is always admitted when nothing else runs.
+    """
+
+    def __init__(self, max_in_flight=None, max_rss=None, interval=None):
+        self.max_in_flight = max_in_flight or settings.WORKER_MAX_IN_FLIGHT
+        self.max_rss = max_rss or settings.WORKER_MAX_RSS
+        self.interval = settings.ADMISSION_INTERVAL if interval is None else interval
+        self.running = 0
+        self.waiting = 0
+        self._last_admission = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def has_room(self):
+        return HostThrottle.in_flight < self.max_in_flight and current_rss_bytes() < self.max_rss
+
+    async def _admit(self):
+        async with self._lock:
+            logged = False
+            while True:
+                wait = self._last_admission + self.interval - time.monotonic()
+                if wait <= 0 and (self.running == 0 or self.has_room()):
+                    break
+                if wait <= 0 and not logged:
+                    logging.info(
+                        f"Scan waiting for room: {self.running} running, {HostThrottle.in_flight} requests in flight, "
+                        f"{current_rss_bytes() // 2**20} MB resident"
+                    )
+                    logged = True
+                await asyncio.sleep(max(wait, self.interval))
+            self._last_admission = time.monotonic()
+
+    async def run(self, coro):
+        """Wait for room, then run `coro` and return its result."""
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._admit()
+        except BaseException:
+            coro.close()
+            raise
+        finally:
+            self.waiting -= 1
+        metrics.observe("admission_wait", time.perf_counter() - start)
+        self.running += 1
+        try:
+            return await coro
+        finally:
+            self.running -= 1
+
+
+class SharedLoop:
+    """Event loop running in a daemon thread, on which every task of the process runs."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self.admission = None
+        self._thread = threading.Thread(target=self._run, name="worker-loop", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start_admission(), self.loop).result()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _start_admission(self):
+        # Created on the loop it synchronizes
+        self.admission = AdmissionController()
+
+    def run(self, coro):
+        """Run `coro` on the loop once admitted and wait for its result from the calling thread."""
+        future = asyncio.run_coroutine_threadsafe(self.admission.run(coro), self.loop)
+        try:
+            return future.result()
+        except BaseException:
+            # The calling thread gave up (e.g. worker shutdown): cancel the coroutine and let it clean up
+            future.cancel()
+            raise
+
+
+def get_shared_loop():
+    """Return the process's shared loop, starting it on first use (again after a fork)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None or _shared.pid != os.getpid():
+            _shared = SharedLoop()
+        return _shared
+
+
+def get_worker_loop():
+    """Return the thread's event loop, creating it on first use."""
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _local.loop = asyncio.new_event_loop()
+    return loop
+
+
+def run_async(coro):
+    """Run a coroutine to completion like asyncio.run, on a loop kept for the next task.
+
+    With ASYNC_WORKER it runs on the process's shared loop, alongside the
+    other tasks, once admitted; otherwise on the calling thread's own loop.
+    """
+    if settings.ASYNC_WORKER:
+        return get_shared_loop().run(coro)
+    loop = get_worker_loop()
+    task = loop.create_task(coro)
+    try:
+        return loop.run_until_complete(task)
+    except BaseException:
+        # E.g. a Celery time limit raised from its signal handler: let the coroutine clean up
+        task.cancel()
+        loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+        raise
@@ -0,0 +1,360 @@
+"""
+End-to-end crawl benchmark against a local synthetic site.
+
+Usage:
+    python -m benchmarks.crawl_bench [--pages 500] [--fan-out 20] [--latency-ms 20 --latency-dist lognormal]
+                                     [--error-rate 0.02] [--redirect-rate 0.05] [--external 5] [--external-head-405]
+                                     [--page-bytes 20000] [--concurrency 10] [--host-max-rate 50] [--redis] [--json]
+
+A subprocess serves a deterministic site: --pages pages each linking to
+--fan-out other pages (some broken or redirected) and to --external links
+on a second host, which can answer HEAD with 405. The real
+async_crawl_website runs against it with an in-process fakeredis (or the
+app's REDIS_URL with --redis) and the benchmark reports pages/sec,
+p50/p99 fetch latency (on the connection pool, behind the politeness
+throttle), p50/p99 time waiting on the throttle, peak RSS and Redis
+commands and round trips per page. Hosts are effectively unthrottled unless
+--host-max-rate is given.
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import random
+import resource
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+# Per-host rate high enough that the token bucket never holds a request back
+UNTHROTTLED_RATE = 1_000_000.0
+
+
+class SyntheticSite:
+    """Deterministic site model: every response only depends on the path and the seed."""
+
+    def __init__(self, args):
+        self.args = args
+
+    def latency(self, rng):
+        mean = self.args.latency_ms / 1000
+        if mean <= 0:
+            return 0
+        if self.args.latency_dist == "uniform":
+            return rng.uniform(0, 2 * mean)
+        if self.args.latency_dist == "exponential":
+            return rng.expovariate(1 / mean)
+        if self.args.latency_dist == "lognormal":
+            # sigma=1 gives a long tail; mu keeps the requested mean
+            return rng.lognormvariate(math.log(mean) - 0.5, 1)
+        return mean
+
+    def page(self, index, external_base):
+        rng = random.Random(f"{self.args.seed}:{index}")
+        links = [f"/p/{(index + 1) % self.args.pages}"]
+        for _ in range(self.args.fan_out - 1):
+            target = rng.randrange(self.args.pages)
+            roll = rng.random()
+            if roll < self.args.error_rate / 2:
+                links.append(f"/missing/{target}")
+            elif roll < self.args.error_rate:
+                links.append(f"/error/{target}")
+            elif roll < self.args.error_rate + self.args.redirect_rate:
+                links.append(f"/r/{target}")
+            else:
+                links.append(f"/p/{target}")
+        links.extend(f"{external_base}/x/{rng.randrange(self.args.external_pool)}" for _ in range(self.args.external))
+
+        body = "".join(f'<li><a href="{link}">Link {i}</a></li>' for i, link in enumerate(links))
+        page = f"<!DOCTYPE html><html><head><title>Page {index}</title></head><body><ul>{body}</ul>"
+        filler = max(0, self.args.page_bytes - len(page) - 20)
+        return f"{page}<p>{'x' * filler}</p></body></html>".encode()
+
+
+def make_handler(site, external_port):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _respond(self, send_body):
+            rng = random.Random()
+            time.sleep(site.latency(rng))
+            external = self.server.server_address[1] == external_port
+            path = self.path.split("?")[0]
+            kind, _, number = path.strip("/").partition("/")
+            headers = {"Content-Type": "text/html; charset=utf-8"}
+            body = b""
+            if external:
+                if self.command == "HEAD" and site.args.external_head_405:
+                    status = 405
+                else:
+                    status, body = 200, b"<html><body>external</body></html>"
+            elif kind == "p" and number.isdigit() and int(number) < site.args.pages:
+                status, body = 200, site.page(int(number), f"http://localhost:{external_port}")
+            elif kind == "r" and number.isdigit():
+                status, headers["Location"] = 301, f"/p/{number}"
+            elif kind == "error":
+                status = 500
+            else:
+                status = 404
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+
+        def do_HEAD(self):
+            self._respond(False)
+
+        def do_GET(self):
+            self._respond(True)
+
+    return Handler
+
+
+def serve_site(args, ports):
+    """Serve the synthetic site and its external host until the process is terminated."""
+    external_server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+    handler = make_handler(SyntheticSite(args), external_server.server_address[1])
+    external_server.RequestHandlerClass = handler
+    site_server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    ports.send((site_server.server_address[1], external_server.server_address[1]))
+    threading.Thread(target=external_server.serve_forever, daemon=True).start()
+    site_server.serve_forever()
+
+
+class RedisCounter:
+    """Count the Redis commands and round trips of every client, sync and asyncio, pipelines included."""
+
+    def __init__(self):
+        self.commands = 0
+        self.round_trips = 0
+
+    def install(self):
+        import redis.client
+        import redis.asyncio.client
+        counter = self
+
+        def count(commands):
+            counter.commands += commands
+            counter.round_trips += 1
+
+        for client in (redis.client.Redis, redis.asyncio.client.Redis):
+            original = client.execute_command
+            if client is redis.client.Redis:
+                def execute_command(self, *args, _original=original, **options):
+                    count(1)
+                    return _original(self, *args, **options)
+            else:
+                async def execute_command(self, *args, _original=original, **options):
+                    count(1)
+                    return await _original(self, *args, **options)
+            client.execute_command = execute_command
+
+        for pipeline in (redis.client.Pipeline, redis.asyncio.client.Pipeline):
+            original_execute = pipeline.execute
+            original_immediate = pipeline.immediate_execute_command
+            if pipeline is redis.client.Pipeline:
+                def execute(self, *args, _original=original_execute, **kwargs):
+                    if self.command_stack:
+                        count(len(self.command_stack) + (2 if self.transaction else 0))
+                    return _original(self, *args, **kwargs)
+
+                def immediate(self, *args, _original=original_immediate, **options):
+                    count(1)
+                    return _original(self, *args, **options)
+            else:
+                async def execute(self, *args, _original=original_execute, **kwargs):
+                    if self.command_stack:
+                        count(len(self.command_stack) + (2 if self.is_transaction else 0))
+                    return await _original(self, *args, **kwargs)
+
+                async def immediate(self, *args, _original=original_immediate, **options):
+                    count(1)
+                    return await _original(self, *args, **options)
+            pipeline.execute = execute
+            pipeline.immediate_execute_command = immediate
+
+
+class LatencyRecorder:
+    """Time every request on the shared connection pool, from send to response headers.
+
+    The pool sits behind the PoliteTransport, so waits for a host's rate or
+    in-flight limit are left out; ThrottleWaitRecorder measures those.
+    """
+
+    def __init__(self):
+        self.samples = []
+
+    def install(self):
+        from app.utils.http_pool import PooledTransport
+        original = PooledTransport.handle_async_request
+        samples = self.samples
+
+        async def handle_async_request(self, request):
+            start = time.perf_counter()
+            response = await original(self, request)
+            samples.append(time.perf_counter() - start)
+            return response
+
+        PooledTransport.handle_async_request = handle_async_request
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ThrottleWaitRecorder(LatencyRecorder):
+    """Time every wait of a request for its host's in-flight slot and rate token."""
+
+    def install(self):
+        from app.utils.politeness import HostThrottle
+        original = HostThrottle.acquire
+        samples = self.samples
+
+        async def acquire(self):
+            start = time.perf_counter()
+            await original(self)
+            samples.append(time.perf_counter() - start)
+
+        HostThrottle.acquire = acquire
+
+
+def use_fakeredis(crawler):
+    try:
+        import fakeredis
+    except ImportError:
+        raise SystemExit("fakeredis is needed for the in-process Redis: pip install fakeredis, or pass --redis")
+    server = fakeredis.FakeServer()
+    crawler.redis_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    crawler.get_async_redis_client = lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+
+
+def run_crawl(args, base_url):
+    from app.api.schemas import ScanOptions
+    from app.core.config import settings
+    from app.services import crawler
+
+    if args.host_max_rate:
+        settings.HOST_MAX_RATE = args.host_max_rate
+    if args.host_max_in_flight:
+        settings.HOST_MAX_IN_FLIGHT = args.host_max_in_flight
+
+    if not args.redis:
+        use_fakeredis(crawler)
+    pending_checks = []
+    crawler.check_link_with_selenium_task.apply_async = lambda *a, **k: pending_checks.append(a)
+
+    redis_counter = RedisCounter()
+    redis_counter.install()
+    latency = LatencyRecorder()
+    latency.install()
+    throttle_wait = ThrottleWaitRecorder()
+    throttle_wait.install()
+
+    scan_options = ScanOptions(
+        concurrency=args.concurrency,
+        single_fetch=not args.no_single_fetch,
+        link_extractor=args.link_extractor,
+        visited_set=args.visited_set,
+    )
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    start = time.perf_counter()
+    stats = asyncio.run(crawler.async_crawl_website(f"bench-{uuid.uuid4()}", base_url, scan_options))
+    elapsed = time.perf_counter() - start
+
+    summary = stats["summary"]
+    pages = max(summary["pages_crawled"], 1)
+    return {
+        "seconds": round(elapsed, 3),
+        "pages_crawled": summary["pages_crawled"],
+        "links_checked": summary["links_checked"],
+        "broken": summary["broken"],
+        "pages_per_second": round(summary["pages_crawled"] / elapsed, 2),
+        "requests": len(latency.samples),
+        "fetch_latency_p50_ms": round(latency.percentile(0.5) * 1000, 2) if latency.samples else None,
+        "fetch_latency_p99_ms": round(latency.percentile(0.99) * 1000, 2) if latency.samples else None,
+        "throttle_wait_p50_ms": round(throttle_wait.percentile(0.5) * 1000, 2) if throttle_wait.samples else None,
+        "throttle_wait_p99_ms": round(throttle_wait.percentile(0.99) * 1000, 2) if throttle_wait.samples else None,
+        "throttle_wait_seconds": round(sum(throttle_wait.samples), 3),
+        "peak_rss_mb": round(stats["peak_rss_bytes"] / 1e6, 1),
+        "baseline_rss_mb": round(baseline_rss / 1e6, 1),
+        "redis_commands_per_page": round(redis_counter.commands / pages, 2),
+        "redis_round_trips_per_page": round(redis_counter.round_trips / pages, 2),
+        "selenium_checks": len(pending_checks),
+        "throttled_responses": stats["throttled_responses"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    site = parser.add_argument_group("synthetic site")
+    site.add_argument("--pages", type=int, default=500, help="number of pages")
+    site.add_argument("--fan-out", type=int, default=20, help="internal links per page")
+    site.add_argument("--external", type=int, default=5, help="external links per page")
+    site.add_argument("--external-pool", type=int, default=50, help="distinct external targets")
+    site.add_argument("--external-head-405", action="store_true", help="external host answers HEAD with 405")
+    site.add_argument("--error-rate", type=float, default=0.02, help="share of internal links answering 404 or 500")
+    site.add_argument("--redirect-rate", type=float, default=0.05, help="share of internal links answering 301")
+    site.add_argument("--latency-ms", type=float, default=20, help="mean response latency")
+    site.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    site.add_argument("--page-bytes", type=int, default=20_000, help="approximate size of each page")
+    site.add_argument("--seed", type=int, default=1)
+    crawl = parser.add_argument_group("crawl")
+    crawl.add_argument("--concurrency", type=int, default=10)
+    crawl.add_argument("--link-extractor", choices=("stream", "bs4"), default="stream")
+    crawl.add_argument("--visited-set", choices=("exact", "fingerprint", "bloom"), default="exact")
+    crawl.add_argument("--no-single-fetch", action="store_true", help="check pages with HEAD then GET")
+    crawl.add_argument(
+        "--host-max-rate", type=float, default=UNTHROTTLED_RATE,
+        help="requests/s per host (default: effectively unlimited; pass HOST_MAX_RATE to include the throttle)",
+    )
+    crawl.add_argument("--host-max-in-flight", type=int, help="requests in flight per host (default HOST_MAX_IN_FLIGHT)")
+    crawl.add_argument("--redis", action="store_true", help="use the Redis at REDIS_URL instead of fakeredis")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    server = multiprocessing.Process(target=serve_site, args=(args, sender), daemon=True)
+    server.start()
+    try:
+        site_port, _ = receiver.recv()
+        results = run_crawl(args, f"http://127.0.0.1:{site_port}/p/0")
+    finally:
+        server.terminate()
+
+    config = {name: value for name, value in vars(args).items() if name != "json"}
+    if args.json:
+        print(json.dumps({"config": config, "results": results}))
+        return
+
+    print(
+        f"{results['pages_crawled']} pages, {results['links_checked']} links in {results['seconds']:.2f}s: "
+        f"{results['pages_per_second']:.1f} pages/s"
+    )
+    print(
+        f"fetch latency p50 {results['fetch_latency_p50_ms']} ms, p99 {results['fetch_latency_p99_ms']} ms "
+        f"over {results['requests']} requests"
+    )
+    print(
+        f"throttle wait p50 {results['throttle_wait_p50_ms']} ms, p99 {results['throttle_wait_p99_ms']} ms, "
+        f"{results['throttle_wait_seconds']}s in total"
+    )
+    print(f"peak RSS {results['peak_rss_mb']} MB (baseline {results['baseline_rss_mb']} MB)")
+    print(
+        f"Redis: {results['redis_commands_per_page']} commands, "
+        f"{results['redis_round_trips_per_page']} round trips per page"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Micro-benchmark comparing link extraction engines on a large HTML corpus.
+
+Usage:
+    python -m benchmarks.link_extractor_bench [--pages 200] [--links 500] [--corpus DIR] [--include-assets]
+
+Without --corpus, a synthetic corpus of template-heavy pages is generated.
+Each page is fed to the extractors in chunks, as it arrives from the network.
+"""
+import argparse
+import json
+import pathlib
+import random
+import time
+import tracemalloc
+
+from app.utils.link_extractor import LINK_EXTRACTORS, get_link_extractor
+
+CHUNK_SIZE = 16 * 1024
+
+
+def generate_page(index, links_per_page):
+    """Build a synthetic page with navigation, content links, images and scripts."""
+    rng = random.Random(index)
+    parts = [
+        "<!DOCTYPE html><html><head><title>Page</title>",
+        '<base href="https://example.com/docs/">',
+        '<link rel="stylesheet" href="/static/site.css"><script src="/static/app.js"></script>',
+        "</head><body><nav>",
+    ]
+    parts.extend(f'<a class="nav" href="/section/{i}">Section {i}</a>' for i in range(30))
+    parts.append("</nav><main>")
+    for i in range(links_per_page):
+        parts.append(
+            f'<div class="card"><p>{"Lorem ipsum dolor sit amet. " * rng.randint(1, 8)}</p>'
+            f'<a href="page-{rng.randint(0, 100000)}.html?ref={i}">More</a>'
+            f'<img src="img/{i}.png" srcset="img/{i}@2x.png 2x, img/{i}@3x.png 3x" alt=""></div>'
+        )
+    parts.append("</main><footer>")
+    parts.extend(f'<a href="https://partner{i}.example.org/">Partner</a>' for i in range(20))
+    parts.append("</footer></body></html>")
+    return "".join(parts)
+
+
+def load_corpus(args):
+    if args.corpus:
+        return [p.read_text(errors="replace") for p in sorted(pathlib.Path(args.corpus).glob("**/*.htm*"))]
+    return [generate_page(i, args.links) for i in range(args.pages)]
+
+
+def extract_corpus(engine, corpus, include_assets):
+    total_links = 0
+    for page in corpus:
+        extractor = get_link_extractor(engine, include_assets)
+        for offset in range(0, len(page), CHUNK_SIZE):
+            extractor.feed(page[offset:offset + CHUNK_SIZE])
+        total_links += len(extractor.links("https://example.com/docs/index.html"))
+    return total_links
+
+
+def run_engine(engine, corpus, include_assets):
+    """Extract links from every page, returning elapsed seconds, peak traced memory and link count.
+
+    Timing and memory are measured in separate passes since tracing slows parsing down.
+    """
+    start = time.perf_counter()
+    total_links = extract_corpus(engine, corpus, include_assets)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    extract_corpus(engine, corpus, include_assets)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, total_links
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200, help="number of synthetic pages")
+    parser.add_argument("--links", type=int, default=500, help="content links per synthetic page")
+    parser.add_argument("--corpus", help="directory of .html files to use instead of synthetic pages")
+    parser.add_argument("--include-assets", action="store_true", help="also extract <link>, <img>, <script> and srcset")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    corpus_bytes = sum(len(page.encode()) for page in corpus)
+    results = {}
+    for engine in LINK_EXTRACTORS:
+        elapsed, peak, total_links = run_engine(engine, corpus, args.include_assets)
+        results[engine] = {
+            "seconds": round(elapsed, 4),
+            "mb_per_second": round(corpus_bytes / elapsed / 1e6, 2),
+            "peak_memory_mb": round(peak / 1e6, 2),
+            "links": total_links,
+        }
+
+    if args.json:
+        print(json.dumps({"pages": len(corpus), "corpus_bytes": corpus_bytes, "results": results}))
+        return
+
+    print(f"{len(corpus)} pages, {corpus_bytes / 1e6:.1f} MB")
+    for engine, result in results.items():
+        print(
+            f"{engine:>8}: {result['seconds']:.3f}s  {result['mb_per_second']:.1f} MB/s  "
+            f"peak {result['peak_memory_mb']:.1f} MB  {result['links']} links"
+        )
+
+
+if __name__ == "__main__":
+    main()
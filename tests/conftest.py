@@ -0,0 +1,28 @@
+import asyncio
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def server():
+    """One in-memory Redis server, shared by the sync and asyncio clients of a test."""
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def sync_redis(server):
+    return fakeredis.FakeRedis(server=server, decode_responses=True)
+
+
+@pytest.fixture
+def run(server):
+    """Run a coroutine function with an asyncio client of the test's server, like the workers do."""
+    def run(func):
+        async def main():
+            redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+            try:
+                return await func(redis)
+            finally:
+                await redis.aclose()
+        return asyncio.run(main())
+    return run
@@ -0,0 +1,76 @@
+from app.api.schemas import ScanOptions
+from app.services.checkpoint import get_checkpoint, restore_checkpoint, save_checkpoint
+from app.services.crawler import ExternalLinkChecker
+from app.services.frontier import Frontier
+from app.utils.result_sink import ResultSink
+from app.utils.result_store import count_records, iter_records
+from app.utils.scan_summary import format_summary, summary_key
+from app.utils.visited_set import make_visited_set
+
+BASE_URL = "https://example.com"
+
+
+def result(path, status=200):
+    return {"url": f"{BASE_URL}{path}", "status": status, "type": "internal", "parent": BASE_URL, "details": "Checked with GET"}
+
+
+def test_restore_returns_to_the_checkpoint(run, sync_redis):
+    options = ScanOptions(visited_set="fingerprint")
+
+    async def scenario(redis):
+        frontier = Frontier(make_visited_set("fingerprint"))
+        for path in ("/", "/a", "/b", "/c"):
+            frontier.put(f"{BASE_URL}{path}", BASE_URL)
+        sink = ResultSink("t", redis, retention=3600)
+        for path in ("/", "/x"):
+            sink.add(result(path))
+            sink.count("pages_crawled")
+        external = ExternalLinkChecker(sink, redis, None, done=make_visited_set("fingerprint"))
+        external.done.add("https://other.example/checked")
+        await save_checkpoint(redis, "t", BASE_URL, options, frontier, external, sink)
+
+        # Work done after the checkpoint is lost with the worker
+        for path in ("/a", "/b", "/missing"):
+            sink.add(result(path, 404 if path == "/missing" else 200))
+        await sink.flush()
+        before = await redis.hgetall(summary_key("t"))
+
+        resumed = Frontier(make_visited_set("fingerprint"))
+        checkpoint = await restore_checkpoint(redis, "t", resumed)
+        restored_external = ExternalLinkChecker(sink, redis, None, done=make_visited_set("fingerprint"))
+        restored_external.restore(checkpoint["external"], checkpoint["external_done"])
+        return before, resumed, checkpoint, restored_external, await redis.hgetall(summary_key("t"))
+
+    before, resumed, checkpoint, external, after = run(scenario)
+    assert format_summary("t", before)["links_checked"] == 5
+    assert checkpoint["results"] == 2
+    assert checkpoint["summary"]["pages_crawled"] == 2
+    # Rows and summary counters written after the checkpoint are dropped
+    assert count_records(sync_redis, "t") == 2
+    assert [record["url"] for _, record in iter_records(sync_redis, "t", 0, 10)] == [f"{BASE_URL}/", f"{BASE_URL}/x"]
+    summary = format_summary("t", after)
+    assert (summary["links_checked"], summary["pages_crawled"], summary["by_status"]) == (2, 2, {"2xx": 2})
+    # The frontier and both visited sets come back as they were
+    assert len(resumed) == 4
+    assert f"{BASE_URL}/c" in resumed.visited and f"{BASE_URL}/d" not in resumed.visited
+    assert not resumed.put(f"{BASE_URL}/a", BASE_URL)
+    assert "https://other.example/checked" in external.done
+    assert get_checkpoint(sync_redis, "t")["base_url"] == BASE_URL
+
+
+def test_restore_without_checkpoint(run, sync_redis):
+    async def scenario(redis):
+        return await restore_checkpoint(redis, "none", Frontier(make_visited_set()))
+
+    assert run(scenario) is None
+    assert get_checkpoint(sync_redis, "none") is None
+
+
+def test_restore_checkpoint_with_listed_external_targets(run):
+    async def scenario(redis):
+        checker = ExternalLinkChecker(None, redis, None)
+        # Checkpoints saved before the targets were dumped list them as URLs
+        checker.restore({"done": ["https://other.example/old"], "waiting": []})
+        return checker
+
+    assert "https://other.example/old" in run(scenario).done
@@ -0,0 +1,168 @@
+import asyncio
+from app.utils.result_store import (
+    CHUNK_SIZE, ResultStore, decode_chunk, encode_chunk, iter_records, pack_record, read_record, unpack_record,
+    update_record,
+)
+
+
+def make_record(i, **changes):
+    record = {
+        "url": f"https://example.com/page/{i}",
+        "status": 404 if i % 7 == 0 else 200,
+        "type": "external" if i % 5 == 0 else "internal",
+        "parent": f"https://example.com/parent/{i % 3}",
+        "details": "Checked with GET",
+    }
+    if i % 11 == 0:
+        record["cached"] = True
+    record.update(changes)
+    return record
+
+
+async def append_all(redis, records, batch=100):
+    store = ResultStore(redis, "t", 3600)
+    for start in range(0, len(records), batch):
+        await store.append(records[start:start + batch])
+        await store.seal()
+    return store
+
+
+def test_pack_round_trip():
+    for record in (make_record(1), make_record(11), make_record(5, status="error", parent=None)):
+        assert unpack_record(pack_record(record)) == record
+
+
+def test_chunk_round_trip():
+    rows = [pack_record(make_record(i)) for i in range(CHUNK_SIZE)]
+    chunk = encode_chunk(rows)
+    assert isinstance(chunk, str)
+    assert decode_chunk(chunk) == rows
+    # Dictionary-encoded parents and details make the chunk much smaller than its rows
+    assert len(chunk) < sum(map(len, rows)) / 2
+
+
+def test_append_across_seal_boundary(run, sync_redis):
+    records = [make_record(i) for i in range(CHUNK_SIZE + 44)]
+
+    async def scenario(redis):
+        store = await append_all(redis, records)
+        return (
+            await store.count(),
+            await redis.llen(store.chunks_key),
+            await redis.llen(store.tail_key),
+            [await store.get(i) for i in (0, CHUNK_SIZE - 1, CHUNK_SIZE, len(records) - 1, len(records))],
+        )
+
+    count, chunks, tail, got = run(scenario)
+    assert (count, chunks, tail) == (len(records), 1, 44)
+    assert got == [records[0], records[CHUNK_SIZE - 1], records[CHUNK_SIZE], records[-1], None]
+    assert [record for _, record in iter_records(sync_redis, "t", 0, 10 ** 6)] == records
+    assert [index for index, _ in iter_records(sync_redis, "t", CHUNK_SIZE - 2, CHUNK_SIZE + 2)] == list(
+        range(CHUNK_SIZE - 2, CHUNK_SIZE + 2)
+    )
+
+
+def test_append_returns_first_index(run):
+    async def scenario(redis):
+        store = ResultStore(redis, "t", 3600)
+        first = []
+        for size in (200, 100, 10):
+            first.append(await store.append([make_record(i) for i in range(size)]))
+            await store.seal()
+        return first
+
+    assert run(scenario) == [0, 200, 300]
+
+
+def test_update_sealed_and_tail_records(run, sync_redis):
+    records = [make_record(i) for i in range(CHUNK_SIZE + 10)]
+    sealed, tail = 3, CHUNK_SIZE + 4
+
+    async def scenario(redis):
+        store = await append_all(redis, records)
+        await store.update(sealed, make_record(sealed, status=200, details="Checked with Selenium"))
+        update_record(sync_redis, "t", tail, make_record(tail, status="error"))
+        return await store.get(sealed), await store.get(tail), await store.get(sealed + 1)
+
+    got_sealed, got_tail, untouched = run(scenario)
+    assert got_sealed["details"] == "Checked with Selenium"
+    assert got_tail["status"] == "error"
+    assert untouched == records[sealed + 1]
+    stored = dict(iter_records(sync_redis, "t", 0, len(records)))
+    assert stored[sealed] == got_sealed and stored[tail] == got_tail
+    assert read_record(sync_redis, "t", tail) == got_tail
+
+
+def test_truncate_inside_sealed_chunk(run, sync_redis):
+    records = [make_record(i) for i in range(2 * CHUNK_SIZE + 30)]
+    length = CHUNK_SIZE + 40
+
+    async def scenario(redis):
+        store = await append_all(redis, records)
+        await store.update(5, make_record(5, details="kept"))
+        await store.update(length + 3, make_record(length + 3, details="dropped"))
+        await store.truncate(length)
+        after_truncate = await store.count(), await redis.llen(store.chunks_key)
+        # Appending again continues right after the kept records and seals as usual
+        store.tail_length = await redis.llen(store.tail_key)
+        first = await store.append([make_record(i, details="again") for i in range(length, length + 300)])
+        await store.seal()
+        return after_truncate, first, await store.count()
+
+    (count, chunks), first, final_count = run(scenario)
+    assert (count, chunks) == (length, 1)
+    assert first == length
+    assert final_count == length + 300
+    stored = dict(iter_records(sync_redis, "t", 0, 10 ** 6))
+    assert [stored[i] for i in range(length)] == [make_record(5, details="kept") if i == 5 else records[i] for i in range(length)]
+    assert all(stored[i]["details"] == "again" for i in range(length, length + 300))
+
+
+def test_truncate_to_zero_and_tail(run):
+    async def scenario(redis):
+        store = await append_all(redis, [make_record(i) for i in range(CHUNK_SIZE + 20)])
+        await store.truncate(CHUNK_SIZE + 5)
+        in_tail = await store.count(), await store.get(CHUNK_SIZE + 4), await store.get(CHUNK_SIZE + 5)
+        await store.truncate(0)
+        return in_tail, await store.count()
+
+    (count, last, gone), empty = run(scenario)
+    assert (count, last, gone, empty) == (CHUNK_SIZE + 5, make_record(CHUNK_SIZE + 4), None, 0)
+
+
+def test_concurrent_seals_keep_every_record_once(run, sync_redis):
+    records = [make_record(i) for i in range(3 * CHUNK_SIZE + 7)]
+
+    async def scenario(redis):
+        writers = [ResultStore(redis, "t", 3600) for _ in range(3)]
+        for i, writer in enumerate(writers):
+            await writer.append(records[i * CHUNK_SIZE:(i + 1) * CHUNK_SIZE + (7 if i == 2 else 0)])
+        # Each writer saw a full chunk in the tail; they race to seal it
+        for writer in writers:
+            writer.tail_length = CHUNK_SIZE
+        await asyncio.gather(*(writer.seal() for writer in writers))
+        return await redis.llen(writers[0].chunks_key), await writers[0].count()
+
+    assert run(scenario) == (3, len(records))
+    assert [record for _, record in iter_records(sync_redis, "t", 0, 10 ** 6)] == records
+
+
+def test_keys_expire_with_retention(run, sync_redis):
+    async def scenario(redis):
+        store = await append_all(redis, [make_record(i) for i in range(CHUNK_SIZE + 1)])
+        return store
+
+    store = run(scenario)
+    for key in (store.chunks_key, store.tail_key, store.meta_key):
+        assert 0 < sync_redis.ttl(key) <= 3600
+
+
+def test_truncate_keeps_keys_expiring(run, sync_redis):
+    async def scenario(redis):
+        store = await append_all(redis, [make_record(i) for i in range(2 * CHUNK_SIZE)])
+        await store.truncate(CHUNK_SIZE + 3)
+        return store
+
+    store = run(scenario)
+    for key in (store.chunks_key, store.tail_key, store.meta_key):
+        assert 0 < sync_redis.ttl(key) <= 3600
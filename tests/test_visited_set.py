@@ -0,0 +1,58 @@
+import pytest
+from app.utils.visited_set import (
+    VISITED_SET_MODES, BloomVisitedSet, FingerprintVisitedSet, make_visited_set,
+)
+
+
+def urls(count, prefix="https://example.com/page/"):
+    return [f"{prefix}{i}" for i in range(count)]
+
+
+@pytest.mark.parametrize("mode", VISITED_SET_MODES)
+def test_add_and_contains(mode):
+    visited = make_visited_set(mode, capacity=1000, error_rate=0.001)
+    assert visited.add("https://example.com/")
+    assert not visited.add("https://example.com/")
+    assert "https://example.com/" in visited
+    assert "https://example.com/other" not in visited
+    assert len(visited) == 1
+
+
+@pytest.mark.parametrize("mode", VISITED_SET_MODES)
+def test_dump_restore_round_trip(mode):
+    visited = make_visited_set(mode, capacity=1000, error_rate=0.001)
+    for url in urls(500):
+        visited.add(url)
+    restored = make_visited_set(mode, capacity=1000, error_rate=0.001)
+    restored.restore(visited.dump())
+    assert len(restored) == 500
+    assert all(url in restored for url in urls(500))
+    assert restored.add("https://example.com/new") and not restored.add(urls(1)[0])
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        make_visited_set("hyperloglog")
+
+
+def test_fingerprint_table_grows():
+    visited = FingerprintVisitedSet(initial_slots=8)
+    added = [visited.add(url) for url in urls(5000)]
+    assert all(added)
+    assert len(visited) == 5000
+    # The table doubles before it gets more than MAX_LOAD full
+    assert len(visited._table) >= 5000 / FingerprintVisitedSet.MAX_LOAD
+    assert all(url in visited for url in urls(5000))
+    assert not any(url in visited for url in urls(1000, "https://example.com/unseen/"))
+
+
+def test_bloom_false_positive_rate():
+    visited = BloomVisitedSet(capacity=10_000, error_rate=0.01)
+    for url in urls(10_000):
+        visited.add(url)
+    assert all(url in visited for url in urls(10_000))
+    probes = urls(20_000, "https://example.com/unseen/")
+    rate = sum(url in visited for url in probes) / len(probes)
+    assert rate < 0.03
+    # Far smaller than the URLs it holds
+    assert visited.memory_bytes() < 20_000